@@ -4,34 +4,166 @@ from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem,
     QLabel, QTextEdit, QFileDialog, QHBoxLayout, QMessageBox, QRubberBand,
     QDesktopWidget, QToolBar, QAction, QColorDialog, QSpinBox, QDialog,
-    QDialogButtonBox, QInputDialog, QButtonGroup, QLineEdit, QFrame
+    QDialogButtonBox, QInputDialog, QButtonGroup, QLineEdit, QFrame, QCheckBox,
+    QGridLayout, QProgressDialog, QListView, QAbstractItemView, QTableWidget,
+    QTableWidgetItem, QHeaderView, QMenu
+)
+from PyQt5.QtGui import (
+    QPixmap, QPainter, QPen, QFont, QColor, QIcon, QBrush, QPalette, QImage, QImageReader
+)
+from PyQt5.QtCore import (
+    Qt, QRect, QPoint, QSize, QTimer, QEventLoop, pyqtSignal, QUrl, QObject, QRunnable,
+    QThreadPool, QAbstractListModel, QModelIndex, QMimeData, QByteArray, QFileSystemWatcher
 )
-from PyQt5.QtGui import QPixmap, QPainter, QPen, QFont, QColor, QIcon, QBrush, QPalette
-from PyQt5.QtCore import Qt, QRect, QPoint, QSize, QTimer, QEventLoop, pyqtSignal, QUrl
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PIL import ImageGrab, Image
 import math
-try:
-    from PIL.ImageQt import ImageQt
-except ImportError:
-    try:
-        from PIL import ImageQt
-    except ImportError:
-        ImageQt = None
-from fpdf import FPDF
+import tempfile
+import hashlib
+import uuid
+from collections import OrderedDict, deque
+import functools
 import time
 
+# Módulos pesados (QtWebEngine, PIL, NumPy, fpdf) são importados apenas quando
+# usados pela primeira vez, para não atrasar a abertura do programa.
+# As pastas 'images' e 'templates' são criadas quando algo é gravado nelas.
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-folders = ['images', 'templates']
 
-for folder in folders:
-    folder_path = os.path.join(current_dir, folder)
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
+class _NullSpan:
+    """Span usado quando a medição está desligada: não faz nada"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "started", "memory")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.memory = None
+        if self.tracer.track_memory:
+            import tracemalloc
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        memory_kb = None
+        if self.memory is not None and self.tracer.track_memory:
+            import tracemalloc
+            memory_kb = (tracemalloc.get_traced_memory()[0] - self.memory) / 1024
+        self.tracer.record(self.name, elapsed * 1000, memory_kb, self.attrs)
+        return False
+
+class Tracer:
+    """Medição de tempo e memória dos trechos críticos (spans)
+
+    Desligado, span() devolve sempre o mesmo objeto vazio. Ligado, cada span
+    registra a duração em images/.metrics.jsonl e guarda as últimas amostras
+    para os percentis. A variação da memória alocada pelo Python (tracemalloc)
+    é opcional, ativada à parte com track_memories(): o tracemalloc deixa
+    todas as alocações mais lentas e distorceria os tempos medidos.
+    """
+
+    def __init__(self, path=None, window=1000):
+        self.path = path or os.path.join(current_dir, "images", ".metrics.jsonl")
+        self.window = window
+        self.enabled = False
+        self.track_memory = False
+        self.samples = {}
+        self.file = None
+
+    def enable(self, enabled=True):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, "a", encoding='utf-8')
+        else:
+            self.track_memories(False)
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def track_memories(self, enabled=True):
+        import tracemalloc
+        if enabled == self.track_memory:
+            return
+        self.track_memory = enabled
+        if enabled:
+            tracemalloc.start()
+        else:
+            tracemalloc.stop()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attrs)
+
+    def record(self, name, elapsed_ms, memory_kb, attrs):
+        import json
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append((elapsed_ms, memory_kb))
+        if self.file is not None:
+            entry = {"ts": time.time(), "span": name, "ms": round(elapsed_ms, 3)}
+            if memory_kb is not None:
+                entry["mem_kb"] = round(memory_kb, 1)
+            entry.update(attrs)
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def summary(self):
+        """[(span, amostras, p50, p90, p99, máximo, memória média)] das amostras recentes
+
+        A memória média é None quando nenhuma amostra mediu a memória.
+        """
+        rows = []
+        for name, samples in sorted(self.samples.items()):
+            durations = sorted(elapsed for elapsed, _ in samples)
+            count = len(durations)
+
+            def percentile(p):
+                return durations[min(count - 1, int(math.ceil(p / 100 * count)) - 1)]
+
+            memories = [memory for _, memory in samples if memory is not None]
+            rows.append((name, count, percentile(50), percentile(90), percentile(99),
+                         durations[-1], sum(memories) / len(memories) if memories else None))
+        return rows
+
+tracer = Tracer()
+
+def traced(name):
+    """Decorador: mede cada chamada da função como um span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
 
 def pil_to_qpixmap(pil_image):
     """Converte imagem PIL para QPixmap de forma compatível"""
+    try:
+        from PIL.ImageQt import ImageQt
+    except ImportError:
+        ImageQt = None
     if ImageQt:
         try:
             return QPixmap.fromImage(ImageQt(pil_image))
@@ -48,289 +180,2458 @@ def pil_to_qpixmap(pil_image):
         pass
     return pixmap
 
-class Step:
-    def __init__(self, image_path, description):
-        self.image_path = image_path
-        self.description = description
+def qimage_to_array(qimage):
+    """Converte QImage para array numpy RGBA (altura x largura x 4)"""
+    import numpy as np
+    qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
+    width, height = qimage.width(), qimage.height()
+    ptr = qimage.constBits()
+    ptr.setsize(qimage.sizeInBytes())
+    # Cada linha pode ter bytes de preenchimento no final
+    rows = np.frombuffer(ptr, np.uint8).reshape(height, qimage.bytesPerLine())
+    return rows[:, :width * 4].reshape(height, width, 4).copy()
+
+def array_to_qimage(arr):
+    """Converte array numpy RGBA (altura x largura x 4) para QImage"""
+    import numpy as np
+    arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    height, width = arr.shape[:2]
+    qimage = QImage(arr.data, width, height, width * 4, QImage.Format_RGBA8888)
+    # Copiar para que a QImage não dependa da memória do array
+    return qimage.copy()
+
+def _box_blur(region, radius):
+    """Desfoque de caixa usando imagem integral (custo independente do raio)"""
+    import numpy as np
+    size = 2 * radius + 1
+    height, width = region.shape[:2]
+    padded = np.pad(region, ((radius, radius), (radius, radius), (0, 0)), mode='edge')
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1, padded.shape[2]), np.int64)
+    integral[1:, 1:] = padded.cumsum(axis=0).cumsum(axis=1)
+    total = (integral[size:size + height, size:size + width]
+             - integral[:height, size:size + width]
+             - integral[size:size + height, :width]
+             + integral[:height, :width])
+    return total // (size * size)
+
+def redact_region(arr, box, mode, strength):
+    """Aplica desfoque ou pixelização na área (x0, y0, x1, y1) do array, no próprio array"""
+    import numpy as np
+    height, width = arr.shape[:2]
+    x0, y0, x1, y1 = box
+    x0, x1 = max(0, min(x0, width)), max(0, min(x1, width))
+    y0, y1 = max(0, min(y0, height)), max(0, min(y1, height))
+    if x1 <= x0 or y1 <= y0:
+        return arr
+
+    # Trabalhar sempre com 3 dimensões (imagens em tons de cinza têm só 2)
+    view = arr if arr.ndim == 3 else arr[:, :, None]
+    region = view[y0:y1, x0:x1].astype(np.int64)
+
+    if mode == "pixelate":
+        block = max(2, int(strength))
+        h, w, channels = region.shape
+        padded = np.pad(region, ((0, -h % block), (0, -w % block), (0, 0)), mode='edge')
+        blocks = padded.reshape(padded.shape[0] // block, block,
+                                padded.shape[1] // block, block, channels).mean(axis=(1, 3))
+        result = np.repeat(np.repeat(blocks, block, axis=0), block, axis=1)[:h, :w]
+        result = np.rint(result)
+    else:
+        # Três passadas de caixa aproximam um desfoque gaussiano
+        radius = max(1, int(strength))
+        result = region
+        for _ in range(3):
+            result = _box_blur(result, radius)
+
+    view[y0:y1, x0:x1] = result.astype(arr.dtype)
+    return arr
+
+def redact_image_file(image_path, box, mode, strength, output_path=None):
+    """Aplica a ocultação em um arquivo de imagem (no próprio arquivo ou em output_path)"""
+    import numpy as np
+    from PIL import Image
+    img = Image.open(image_path)
+    img.load()
+    if img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGBA")
+    arr = np.array(img)
+    redact_region(arr, box, mode, strength)
+    atomic_save_image(Image.fromarray(arr), output_path or image_path)
+
+def atomic_save_image(img, image_path):
+    """Salva a imagem em arquivo temporário e substitui o destino de uma vez"""
+    directory = os.path.dirname(os.path.abspath(image_path))
+    fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(image_path)[1] or ".png", dir=directory)
+    os.close(fd)
+    try:
+        img.save(temp_path)
+        os.replace(temp_path, image_path)
+    except:
+        try:
+            os.remove(temp_path)
+        except:
+            pass
+        raise
+
+def apply_image_operations(img, operations):
+    """Aplica a sequência de operações [(nome, parâmetros), ...] em uma imagem PIL"""
+    from PIL import Image
+    for name, params in operations:
+        if name == "crop":
+            left = min(params["left"], img.width - 1)
+            top = min(params["top"], img.height - 1)
+            right = max(left + 1, img.width - params["right"])
+            bottom = max(top + 1, img.height - params["bottom"])
+            img = img.crop((left, top, right, bottom))
+
+        elif name == "resize":
+            max_width = params["max_width"]
+            if img.width > max_width:
+                new_height = max(1, round(img.height * max_width / img.width))
+                img = img.resize((max_width, new_height), Image.LANCZOS)
+
+        elif name == "watermark":
+            from PIL import ImageDraw, ImageFont
+            font_size = max(12, img.width // 30)
+            try:
+                font = ImageFont.truetype("arial.ttf", font_size)
+            except OSError:
+                font = ImageFont.load_default()
+            mode = img.mode
+            base = img.convert("RGBA")
+            overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(overlay)
+            left, top, right, bottom = draw.textbbox((0, 0), params["text"], font=font)
+            margin = font_size // 2
+            position = (base.width - (right - left) - margin, base.height - (bottom - top) - margin)
+            alpha = int(255 * params["opacity"] / 100)
+            draw.text(position, params["text"], font=font, fill=(255, 255, 255, alpha),
+                      stroke_width=1, stroke_fill=(0, 0, 0, alpha))
+            img = Image.alpha_composite(base, overlay)
+            if mode != "RGBA":
+                img = img.convert(mode if mode in ("RGB", "L") else "RGB")
+
+        elif name == "border":
+            from PIL import ImageOps
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
+            img = ImageOps.expand(img, border=params["width"], fill=params["color"])
+
+        elif name == "rectangles":
+            # Mesmo traço do retângulo do editor de imagens
+            from PIL import ImageDraw
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
+            draw = ImageDraw.Draw(img)
+            for box in params["boxes"]:
+                draw.rectangle(box, outline=params["color"], width=params["width"])
+
+    return img
+
+def process_image_job(image_path, operations, dry_run=False, output_path=None):
+    """Tarefa executada nos processos de trabalho: aplica as operações em um arquivo"""
+    from PIL import Image
+    output_path = output_path or image_path
+    img = Image.open(image_path)
+    img.load()
+    original_size = img.size
+    img = apply_image_operations(img, operations)
+    if dry_run:
+        return output_path, original_size, img.size, None
+    atomic_save_image(img, output_path)
+    # Metadados calculados aqui, em paralelo, e não na thread da interface
+    return output_path, original_size, img.size, ImageMeta.from_file(output_path).to_dict()
+
+def label_grid(mask):
+    """Componentes conexos (vizinhança de 8) de uma grade booleana; 0 = fundo
+
+    Cada célula recebe repetidamente o menor rótulo da vizinhança até estabilizar.
+    O rótulo é o índice + 1 de uma célula do mesmo componente, e o rótulo dessa
+    célula é copiado a cada passada: regiões sinuosas convergem em poucas passadas.
+    """
+    import numpy as np
+    height, width = mask.shape
+    background = mask.size + 1
+    labels = np.where(mask, np.arange(1, mask.size + 1).reshape(mask.shape), background)
+    while True:
+        padded = np.pad(labels, 1, constant_values=background)
+        neighbors = [padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+                     for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+        updated = np.where(mask, np.minimum.reduce(neighbors), background)
+        flat = np.append(updated.ravel(), background)
+        updated = np.minimum(updated, flat[updated - 1])
+        if np.array_equal(updated, labels):
+            return np.where(mask, labels, 0)
+        labels = updated
+
+def find_changed_regions(previous, current, threshold=32, block=16, gap=2,
+                         min_pixels=12, margin=6, max_fraction=0.6):
+    """Caixas (x0, y0, x1, y1) em volta do que mudou entre dois arrays RGB do mesmo tamanho
+
+    Os pixels alterados são contados em uma grade de blocos; blocos a até 'gap'
+    blocos de distância formam uma mesma região, e cada região vira uma caixa
+    ajustada aos pixels alterados. Retorna None se a tela mudou quase toda.
+    """
+    import numpy as np
+    # Diferença absoluta sem converter os arrays (uint8)
+    changed = (np.maximum(previous, current) - np.minimum(previous, current)).max(axis=2) > threshold
+    if not changed.any():
+        return []
+    if changed.mean() > max_fraction:
+        return None
+
+    height, width = changed.shape
+    rows, cols = -(-height // block), -(-width // block)
+    padded = np.zeros((rows * block, cols * block), bool)
+    padded[:height, :width] = changed
+    counts = padded.reshape(rows, block, cols, block).sum(axis=(1, 3))
+    grid = counts > 0
+
+    # Mudanças próximas (ex.: palavras de uma mesma frase) ficam na mesma caixa
+    near = np.zeros_like(grid)
+    spread = np.pad(grid, gap)
+    for dy in range(2 * gap + 1):
+        for dx in range(2 * gap + 1):
+            near |= spread[dy:dy + rows, dx:dx + cols]
+    labels = np.where(grid, label_grid(near), 0)
+
+    ys, xs = np.nonzero(labels)
+    ids = labels[ys, xs]
+    order = np.argsort(ids, kind="stable")
+    ids, ys, xs = ids[order], ys[order], xs[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    pixels = np.add.reduceat(counts[ys, xs], starts)
+
+    boxes = []
+    for top, left, bottom, right, total in zip(
+            np.minimum.reduceat(ys, starts), np.minimum.reduceat(xs, starts),
+            np.maximum.reduceat(ys, starts), np.maximum.reduceat(xs, starts), pixels):
+        if total < min_pixels:
+            continue
+        # Da grade de blocos para os pixels alterados de fato
+        y0, x0 = top * block, left * block
+        region = changed[y0:(bottom + 1) * block, x0:(right + 1) * block]
+        changed_rows = np.flatnonzero(region.any(axis=1))
+        changed_cols = np.flatnonzero(region.any(axis=0))
+        boxes.append((max(0, int(x0 + changed_cols[0]) - margin),
+                      max(0, int(y0 + changed_rows[0]) - margin),
+                      min(width - 1, int(x0 + changed_cols[-1]) + margin),
+                      min(height - 1, int(y0 + changed_rows[-1]) + margin)))
+    # Ordem de leitura
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+def detect_changes_job(previous_path, current_path):
+    """Tarefa executada nos processos de trabalho: caixas do que mudou na etapa em
+    relação à anterior, ou None se as imagens não forem comparáveis"""
+    import numpy as np
+    from PIL import Image
+    with Image.open(previous_path) as previous, Image.open(current_path) as current:
+        if previous.size != current.size:
+            return None
+        return find_changed_regions(np.asarray(previous.convert("RGB")),
+                                    np.asarray(current.convert("RGB")))
+
+def row_signatures(pixels, bands=64):
+    """Assinatura inteira de cada linha de um array (altura x largura x canais)
+
+    Soma os bytes de cada linha em faixas verticais (uma passada, sem cópias) e
+    combina as somas com pesos fixos; linhas iguais têm a mesma assinatura.
+    """
+    import numpy as np
+    rows = pixels.reshape(pixels.shape[0], -1)
+    bands = max(1, min(bands, rows.shape[1]))
+    if rows.shape[1] % bands == 0:
+        # Faixas de mesmo tamanho: soma direta, bem mais rápida que reduceat
+        sums = rows.reshape(len(rows), bands, -1).sum(axis=2, dtype=np.uint32)
+    else:
+        starts = np.linspace(0, rows.shape[1], bands, endpoint=False).astype(np.intp)
+        sums = np.add.reduceat(rows, starts, axis=1, dtype=np.uint32)
+    sums = sums.astype(np.uint64)
+    weights = np.random.default_rng(1).integers(1, 2 ** 62, bands, dtype=np.uint64)
+    return (sums * weights).sum(axis=1, dtype=np.uint64)
+
+def find_scroll_offset(previous, current, min_votes=3):
+    """Quantas linhas o conteúdo rolou entre dois quadros da mesma região,
+    a partir das assinaturas de linha (row_signatures)
+
+    Cada linha do quadro atual com assinatura única no anterior vota no
+    deslocamento que a leva até lá; linhas fixas (cabeçalho e rodapé da região)
+    votam em zero e não atrapalham. Retorna (deslocamento, linhas do rodapé fixo),
+    (0, 0) se o conteúdo não mudou ou None se não houver sobreposição confiável.
+    """
+    import numpy as np
+    if np.array_equal(previous, current):
+        return 0, 0
+    height = len(previous)
+    values, index, counts = np.unique(previous, return_index=True, return_counts=True)
+    values, index = values[counts == 1], index[counts == 1]
+    position = np.searchsorted(values, current).clip(0, max(len(values) - 1, 0))
+    matched = (values[position] == current) if len(values) else np.zeros(len(current), bool)
+    offsets = index[position[matched]] - np.flatnonzero(matched)
+    offsets = offsets[offsets > 0]
+    if len(offsets) == 0:
+        return None
+    votes = np.bincount(offsets)
+    offset = int(votes.argmax())
+    if votes[offset] < min_votes or votes[offset] * 2 < len(offsets):
+        return None
+    # Rodapé fixo: últimas linhas iguais nos dois quadros
+    same = previous[::-1] == current[::-1]
+    footer = int(same.argmin()) if not same.all() else height
+    return offset, min(footer, height - offset)
+
+class ScrollStitcher:
+    """Junta quadros sucessivos de uma região rolada em uma única imagem alta
+
+    Cada quadro é comparado apenas com o anterior; as faixas novas são guardadas
+    e concatenadas uma única vez no final.
+    """
+    def __init__(self):
+        self.parts = []
+        self.previous = None
+        self.signatures = None
+        self.height = 0
+
+    def add_frame(self, image):
+        """Acrescenta o quadro (PIL); retorna 'added', 'same' ou 'no_overlap'"""
+        import numpy as np
+        pixels = np.asarray(image.convert("RGB"))
+        signatures = row_signatures(pixels)
+        if self.previous is None:
+            self.parts.append(pixels)
+            self.height = len(pixels)
+        else:
+            if pixels.shape != self.previous.shape:
+                return "no_overlap"
+            result = find_scroll_offset(self.signatures, signatures)
+            if result is None:
+                return "no_overlap"
+            offset, footer = result
+            if offset == 0:
+                return "same"
+            height = len(pixels)
+            if footer:
+                # O rodapé fixo sai do meio da imagem e volta no final, com o quadro novo
+                last = self.parts.pop()
+                self.parts.append(last[:len(last) - footer])
+            self.parts.append(pixels[height - offset - footer:])
+            self.height += offset
+        self.previous, self.signatures = pixels, signatures
+        return "added"
+
+    def image(self):
+        import numpy as np
+        from PIL import Image
+        return Image.fromarray(np.concatenate(self.parts)) if self.parts else None
+
+# Larguras geradas para cada imagem do site (atributo srcset)
+SITE_IMAGE_WIDTHS = (480, 960, 1600)
+
+def write_image_variants(img, output_dir, name, widths=SITE_IMAGE_WIDTHS, quality=85):
+    """Grava a imagem já decodificada em várias larguras (para srcset)
+
+    Usa WebP quando o Pillow tiver suporte (PNG caso contrário) e nunca amplia a
+    imagem. Retorna [(largura, altura, nome do arquivo)] em ordem crescente.
+    """
+    from PIL import Image, features
+    webp = features.check("webp")
+
+    targets = {width for width in widths if width < img.width}
+    targets.add(min(img.width, max(widths)))
+
+    variants = []
+    source = img
+    # Da maior para a menor: cada redução parte da anterior, que já é menor
+    for width in sorted(targets, reverse=True):
+        height = max(1, round(img.height * width / img.width))
+        if width != source.width:
+            source = source.resize((width, height), Image.LANCZOS)
+        file_name = f"{name}_{width}.{'webp' if webp else 'png'}"
+        output_path = os.path.join(output_dir, file_name)
+        if webp:
+            source.save(output_path, "WEBP", quality=quality, method=4)
+        else:
+            source.save(output_path, "PNG", optimize=True)
+        variants.append((width, height, file_name))
+    return variants[::-1]
+
+def pdf_image_info(img):
+    """Imagem decodificada no formato interno do fpdf, pronta para ser incorporada
+
+    A transparência é aplicada sobre fundo branco (a cor da página) e os pixels
+    são comprimidos aqui, nos processos de trabalho.
+    """
+    import zlib
+    from PIL import Image
+    if img.mode not in ("RGB", "L", "RGBA", "LA"):
+        img = img.convert("RGBA" if "transparency" in img.info or "A" in img.getbands() else "RGB")
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB" if img.mode == "RGBA" else "L", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    return {"w": img.width, "h": img.height,
+            "cs": "DeviceRGB" if img.mode == "RGB" else "DeviceGray",
+            "bpc": 8, "f": "FlateDecode", "data": zlib.compress(img.tobytes(), 6)}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _png_pdf_stream(data):
+    """Dados IDAT do PNG como fluxo do PDF, quando o PDF aceita o formato diretamente
+
+    Retorna None para PNG com transparência, entrelaçamento ou 16 bits por canal.
+    """
+    import struct
+    header, palette, chunks = None, None, []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        body = pos + 8
+        if chunk_type == b"IHDR":
+            header = struct.unpack(">IIBBBBB", data[body:body + 13])
+            width, height, bpc, color_type, _, _, interlace = header
+            if interlace or bpc > 8 or color_type not in (0, 2, 3):
+                return None
+        elif chunk_type == b"PLTE":
+            palette = data[body:body + length]
+        elif chunk_type == b"tRNS":
+            return None
+        elif chunk_type == b"IDAT":
+            chunks.append((body, body + length))
+        elif chunk_type == b"IEND":
+            break
+        pos = body + length + 4  # dados + CRC
+    if header is None or not chunks or (color_type == 3 and not palette):
+        return None
+
+    colors = 3 if color_type == 2 else 1
+    with memoryview(data) as view:
+        # Os blocos IDAT juntos formam o fluxo zlib, com os filtros PNG (Predictor 15)
+        stream = b"".join(view[start:end] for start, end in chunks)
+    info = {"w": width, "h": height,
+            "cs": {0: "DeviceGray", 2: "DeviceRGB", 3: "Indexed"}[color_type],
+            "bpc": bpc, "f": "FlateDecode",
+            "dp": f"/Predictor 15 /Colors {colors} /BitsPerComponent {bpc} /Columns {width}",
+            "data": stream}
+    if color_type == 3:
+        info["pal"] = palette
+    return info
+
+def _jpeg_pdf_stream(data):
+    """JPEG inteiro como fluxo DCTDecode (baseline ou progressivo, 8 bits)"""
+    import struct
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            pos += 2
+            continue
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            # Codificação aritmética e sem perdas não são aceitas pelos leitores de PDF
+            if marker not in (0xC0, 0xC1, 0xC2):
+                return None
+            bpc = data[pos + 4]
+            height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+            color_space = {1: "DeviceGray", 3: "DeviceRGB", 4: "DeviceCMYK"}.get(data[pos + 9])
+            if bpc != 8 or color_space is None:
+                return None
+            return {"w": width, "h": height, "cs": color_space, "bpc": 8,
+                    "f": "DCTDecode", "data": data[:]}
+        pos += 2 + length
+    return None
+
+def pdf_image_from_file(image_path, img=None):
+    """Imagem do arquivo no formato interno do fpdf, lida por mapeamento de memória
+
+    JPEG e PNG que o PDF aceita como estão têm os dados comprimidos copiados sem
+    decodificação; só os demais (transparência, 16 bits, outros formatos) são
+    convertidos por pdf_image_info, usando img se a imagem já estiver aberta.
+    """
+    import mmap
+    info = None
+    with open(image_path, "rb") as image_file:
+        with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(PNG_SIGNATURE)] == PNG_SIGNATURE:
+                info = _png_pdf_stream(data)
+            elif data[:2] == b"\xff\xd8":
+                info = _jpeg_pdf_stream(data)
+    if info is not None:
+        return info
+
+    if img is None:
+        from PIL import Image
+        img = Image.open(image_path)
+        img.load()
+    return pdf_image_info(img)
+
+def prepare_export_image(image_path, formats, site_dir=None, name=None):
+    """Tarefa executada nos processos de trabalho: decodifica a imagem no máximo uma
+    vez e gera o que cada formato de exportação precisa a partir dela"""
+    from PIL import Image
+    img = None
+    result = {}
+    if "site" in formats:
+        img = Image.open(image_path)
+        img.load()
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+        result["site"] = write_image_variants(img, site_dir, name)
+        result["size"] = img.size
+    if "pdf" in formats:
+        # PNG/JPEG compatíveis vão para o PDF sem decodificação; os demais usam a imagem já aberta
+        result["pdf"] = pdf_image_from_file(image_path, img)
+        result["size"] = (result["pdf"]["w"], result["pdf"]["h"])
+    return result
+
+def parse_inline(text):
+    """Trechos [(texto, estilo)] de uma linha; estilo '' (normal), 'B', 'I' ou 'C' (código)"""
+    import re
+    runs = []
+    # _ e __ só marcam ênfase fora de palavras: nomes como config_file_path.txt ficam intactos
+    pattern = (r"(`[^`]+`|\*\*[^*]+\*\*|(?<!\w)__[^_]+__(?!\w)|\*[^*\s][^*]*\*"
+               r"|(?<!\w)_[^_\s][^_]*_(?!\w))")
+    for i, part in enumerate(re.split(pattern, text)):
+        if not part:
+            continue
+        if i % 2 == 0:
+            runs.append((part, ""))
+        elif part[0] == "`":
+            runs.append((part[1:-1], "C"))
+        elif part[:2] in ("**", "__"):
+            runs.append((part[2:-2], "B"))
+        else:
+            runs.append((part[1:-1], "I"))
+    return runs
+
+def parse_rich_text(text):
+    """Subconjunto de Markdown das descrições: **negrito**, *itálico*, `código`
+    e listas ("- item" ou "1. item")
+
+    Retorna um bloco por linha: (tipo, marcador, trechos), com tipo 'paragraph',
+    'bullet' ou 'number'; linhas vazias viram parágrafos sem trechos.
+    """
+    import re
+    blocks = []
+    for line in text.split("\n"):
+        match = re.match(r"\s*[-*+]\s+(.*)$", line)
+        if match:
+            blocks.append(("bullet", "•", parse_inline(match.group(1))))
+            continue
+        match = re.match(r"\s*(\d+)[.)]\s+(.*)$", line)
+        if match:
+            blocks.append(("number", match.group(1) + ".", parse_inline(match.group(2))))
+            continue
+        blocks.append(("paragraph", None, parse_inline(line.rstrip())))
+    return blocks
+
+@functools.lru_cache(maxsize=256)
+def rich_text_to_html(text):
+    """HTML da descrição formatada (pré-visualização no aplicativo e site exportado)"""
+    from html import escape
+    tags = {"": "{}", "B": "<b>{}</b>", "I": "<i>{}</i>", "C": "<code>{}</code>"}
+    parts = []
+    paragraph = []
+    open_list = None
+
+    def inline(runs):
+        return "".join(tags[style].format(escape(value)) for value, style in runs)
+
+    def close_paragraph():
+        if paragraph:
+            parts.append("<p>" + "<br>\n".join(paragraph) + "</p>")
+            paragraph.clear()
+
+    for kind, marker, runs in parse_rich_text(text):
+        list_tag = {"bullet": "ul", "number": "ol"}.get(kind)
+        if open_list and list_tag != open_list:
+            parts.append(f"</{open_list}>")
+            open_list = None
+        if list_tag:
+            close_paragraph()
+            if open_list is None:
+                start = f' start="{marker[:-1]}"' if kind == "number" and marker != "1." else ""
+                parts.append(f"<{list_tag}{start}>")
+                open_list = list_tag
+            parts.append(f"<li>{inline(runs)}</li>")
+        elif runs:
+            paragraph.append(inline(runs))
+        else:
+            close_paragraph()
+    close_paragraph()
+    if open_list:
+        parts.append(f"</{open_list}>")
+    return "\n".join(parts)
+
+def build_site_html(title, description, sections, image_dir="img"):
+    """Página única com a capa e as etapas; sections = [(título, descrição, variantes)]"""
+    from html import escape
+
+    def paragraph(text):
+        return rich_text_to_html(text) if text.strip() else ""
+
+    parts = [
+        "<!DOCTYPE html>",
+        '<html lang="pt-BR">',
+        "<head>",
+        '<meta charset="utf-8">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        f"<title>{escape(title)}</title>",
+        "<style>",
+        "body { font-family: 'Segoe UI', Arial, sans-serif; max-width: 900px; margin: 0 auto;"
+        " padding: 24px; color: #424242; line-height: 1.5; }",
+        "header { border-bottom: 2px solid #E0E0E0; margin-bottom: 32px; }",
+        "section { margin-bottom: 48px; }",
+        "img { max-width: 100%; height: auto; border: 1px solid #E0E0E0; border-radius: 4px; }",
+        "</style>",
+        "</head>",
+        "<body>",
+        f"<header><h1>{escape(title)}</h1>{paragraph(description)}</header>",
+    ]
+    for i, (heading, text, variants) in enumerate(sections, 1):
+        parts.append(f'<section id="etapa-{i}">')
+        parts.append(f"<h2>Etapa {i}: {escape(heading)}</h2>")
+        parts.append(paragraph(text))
+        if variants:
+            # Largura e altura definidas evitam que a página salte enquanto as imagens carregam
+            width, height, file_name = variants[-1]
+            srcset = ", ".join(f"{image_dir}/{name} {w}w" for w, _, name in variants)
+            default = variants[len(variants) // 2][2]
+            # A primeira imagem aparece logo ao abrir a página: sem carregamento adiado
+            loading = "eager" if i == 1 else "lazy"
+            parts.append(
+                f'<img src="{image_dir}/{default}" srcset="{srcset}" '
+                f'sizes="(max-width: 900px) 100vw, 900px" width="{width}" height="{height}" '
+                f'loading="{loading}" decoding="async" alt="{escape(heading)}">'
+            )
+        parts.append("</section>")
+    parts += ["</body>", "</html>", ""]
+    return "\n".join(parts)
+
+def build_site_markdown(title, description, sections, image_dir="img"):
+    """Versão Markdown do site (para wikis): usa a variante intermediária de cada imagem"""
+    lines = [f"# {title}", ""]
+    if description.strip():
+        lines += [description, ""]
+    for i, (heading, text, variants) in enumerate(sections, 1):
+        lines += [f"## Etapa {i}: {heading}", ""]
+        if text.strip():
+            lines += [text, ""]
+        if variants:
+            lines += [f"![{heading}]({image_dir}/{variants[len(variants) // 2][2]})", ""]
+    return "\n".join(lines)
+
+def unicode_font_candidates():
+    """Fontes TrueType do sistema com boa cobertura Unicode: (normal, negrito, itálico)"""
+    windows_fonts = os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts")
+    return [
+        tuple(os.path.join(windows_fonts, name) for name in ("arial.ttf", "arialbd.ttf", "ariali.ttf")),
+        tuple(os.path.join(windows_fonts, name) for name in ("segoeui.ttf", "segoeuib.ttf", "segoeuii.ttf")),
+        ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+         "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+         "/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf"),
+        ("/usr/share/fonts/dejavu/DejaVuSans.ttf",
+         "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+         "/usr/share/fonts/dejavu/DejaVuSans-Oblique.ttf"),
+        ("/System/Library/Fonts/Supplemental/Arial.ttf",
+         "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+         "/System/Library/Fonts/Supplemental/Arial Italic.ttf"),
+    ]
+
+def find_unicode_font():
+    """Arquivos da primeira fonte encontrada, por estilo do fpdf ('', 'B', 'I')"""
+    for regular, bold, italic in unicode_font_candidates():
+        if os.path.exists(regular):
+            return {"": regular,
+                    "B": bold if os.path.exists(bold) else regular,
+                    "I": italic if os.path.exists(italic) else regular}
+    return None
+
+def find_mono_font():
+    """Fonte monoespaçada do sistema para trechos de código, ou None"""
+    windows_fonts = os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts")
+    candidates = [
+        os.path.join(windows_fonts, "consola.ttf"),
+        os.path.join(windows_fonts, "cour.ttf"),
+        "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+        "/usr/share/fonts/dejavu/DejaVuSansMono.ttf",
+        "/System/Library/Fonts/Supplemental/Courier New.ttf",
+    ]
+    return next((path for path in candidates if os.path.exists(path)), None)
+
+class _SubsetList(list):
+    """Caracteres usados com uma fonte, com teste de pertinência em tempo constante
+
+    O fpdf testa 'cid in subset' para cada caractere da fonte ao gravar as larguras;
+    com a lista comum o custo cresce com o tamanho do documento.
+    """
+    def __init__(self, items):
+        super().__init__(items)
+        self.members = set(self)
+
+    def __contains__(self, item):
+        return item in self.members
+
+def _install_font_subset_cache(fpdf_module):
+    """Memoriza os subconjuntos de fonte gerados pelo fpdf entre exportações"""
+    base = fpdf_module.TTFontFile
+    if getattr(base, "subset_cache", None) is not None:
+        return
+
+    class CachedTTFontFile(base):
+        # (arquivo, mtime, caracteres) -> (fonte reduzida, codeToGlyph, maxUni)
+        subset_cache = LRUCache(32)
+
+        def makeSubset(self, file, subset):
+            key = (file, os.stat(file).st_mtime_ns, frozenset(subset))
+            cached = self.subset_cache.get(key)
+            if cached is None:
+                stream = base.makeSubset(self, file, subset)
+                self.subset_cache.put(key, (stream, dict(self.codeToGlyph), self.maxUni))
+                return stream
+            stream, code_to_glyph, self.maxUni = cached
+            # O fpdf lê codeToGlyph e maxUni depois de gerar o subconjunto
+            self.codeToGlyph = dict(code_to_glyph)
+            return stream
+
+    fpdf_module.TTFontFile = CachedTTFontFile
+
+def setup_pdf_fonts(pdf, family="DocSans"):
+    """Registra uma fonte Unicode do sistema no PDF; retorna a família ou None
+
+    O fpdf incorpora apenas os caracteres usados (subconjunto da fonte). As métricas
+    de cada fonte ficam em images/.fonts, e os subconjuntos, em memória.
+    """
+    files = find_unicode_font()
+    if files is None:
+        return None
+    try:
+        import fpdf.fpdf as fpdf_module
+        cache_dir = os.path.join(current_dir, "images", ".fonts")
+        os.makedirs(cache_dir, exist_ok=True)
+        # Cache por hash do caminho: a pasta de fontes do sistema pode não ser gravável
+        fpdf_module.FPDF_CACHE_MODE = 2
+        fpdf_module.FPDF_CACHE_DIR = cache_dir
+        _install_font_subset_cache(fpdf_module)
+        for style, path in files.items():
+            pdf.add_font(family, style, path, uni=True)
+    except Exception:
+        return None
+    return family
+
+def setup_pdf_mono_font(pdf, family="DocMono"):
+    """Registra a fonte monoespaçada Unicode (após setup_pdf_fonts); retorna a família ou None"""
+    path = find_mono_font()
+    if path is None:
+        return None
+    try:
+        pdf.add_font(family, '', path, uni=True)
+    except Exception:
+        return None
+    return family
+
+class PDFDocumentWriter:
+    """Monta o PDF do documento: capa e etapas, uma por página ou em layout compacto
+
+    A imagem de cada etapa pode ser o caminho do arquivo ou um dicionário já
+    preparado (pdf_image_from_file); imagens com a mesma chave (hash do conteúdo)
+    são incorporadas uma única vez.
+    """
+    page_margin = 15
+    # Layout compacto: espaço entre etapas e largura mínima de cada uma (mm)
+    block_gap = 6
+    min_block_width = 60
+    # Linhas já quebradas das descrições, compartilhadas entre exportações
+    layout_cache = None
+
+    def __init__(self, title, description, layout="page"):
+        from fpdf import FPDF
+        self.pdf = pdf = FPDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+
+        # Fonte Unicode do sistema; sem ela, Arial embutida (apenas latin-1)
+        self.font_family = setup_pdf_fonts(pdf) or 'Arial'
+        self.unicode = self.font_family != 'Arial'
+        # Trechos de código: monoespaçada Unicode quando houver; senão Courier (latin-1)
+        self.mono_family = (self.unicode and setup_pdf_mono_font(pdf)) or 'Courier'
+        if PDFDocumentWriter.layout_cache is None:
+            PDFDocumentWriter.layout_cache = LRUCache(4096)
+
+        # Página de título
+        pdf.add_page()
+        pdf.set_font(self.font_family, 'B', 24)
+        pdf.cell(0, 20, self.text(title), 0, 1, 'C')
+        pdf.ln(40)  # Espaço após o título
+
+        # Descrição na capa
+        if description:
+            # Centralizada na página pela altura medida das linhas já quebradas
+            width = pdf.w - pdf.l_margin - pdf.r_margin
+            lines = self.layout_text(description, width, 12)
+            total_height = len(lines) * 6
+            y_position = max(pdf.get_y(), (pdf.h - total_height) / 2)
+            self.draw_text(lines, pdf.l_margin, y_position, width, 12, 6, align='C')
+
+        self.content_width = pdf.w - (2 * self.page_margin)
+        self.step_count = 0
+        self.layout = layout
+        # Layout compacto: (x, y, altura da linha atual) para a próxima etapa
+        self.cursor = None
+
+    @traced("pdf.step")
+    def add_step(self, description, image=None, size=None, key=None, error=None):
+        """Adiciona a etapa; size = (largura, altura) da imagem em pixels"""
+        if self.layout == "compact":
+            self.add_compact_step(description, image, size, key, error)
+        else:
+            self.add_page_step(description, image, size, key, error)
+
+    def add_page_step(self, description, image=None, size=None, key=None, error=None):
+        pdf = self.pdf
+        page_margin, content_width = self.page_margin, self.content_width
+        self.step_count += 1
+        pdf.add_page()
+        current_y = page_margin
+
+        # Título da etapa
+        pdf.set_font(self.font_family, 'B', 14)
+        pdf.set_xy(page_margin, current_y)
+        pdf.cell(content_width, 10, f'Etapa {self.step_count}', 0, 1, 'L')
+        current_y += 15
 
-class CoverDialog(QDialog):
-    def __init__(self, title="", description="", parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Editar Capa")
-        self.setModal(True)
-        
-        # Configurar estilo moderno
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #f5f5f5;
-                font-family: 'Segoe UI', Arial;
-            }
-            QLabel {
-                color: #424242;
-                font-weight: bold;
-                font-size: 12px;
-            }
-            QLineEdit, QTextEdit {
-                background-color: white;
-                border: 1px solid #E0E0E0;
-                border-radius: 4px;
-                padding: 8px;
-                font-size: 12px;
-            }
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #1976D2;
-            }
-            QPushButton:pressed {
-                background-color: #0D47A1;
-            }
-        """)
-        
-        # Layout principal
-        layout = QVBoxLayout(self)
-        layout.setSpacing(15)
-        layout.setContentsMargins(20, 20, 20, 20)
-        
-        # Título
-        title_label = QLabel("📑 Título:")
-        self.title_edit = QLineEdit(title)
-        self.title_edit.setPlaceholderText("Digite o título da documentação")
-        layout.addWidget(title_label)
-        layout.addWidget(self.title_edit)
-        
         # Descrição
-        desc_label = QLabel("📝 Descrição:")
-        self.desc_edit = QTextEdit()
-        self.desc_edit.setPlaceholderText("Digite a descrição da documentação")
-        self.desc_edit.setText(description)
-        self.desc_edit.setMinimumHeight(100)
-        layout.addWidget(desc_label)
-        layout.addWidget(self.desc_edit)
-        
-        # Botões
-        button_layout = QHBoxLayout()
-        button_layout.setSpacing(10)
-        
-        ok_button = QPushButton("✅ Salvar")
-        ok_button.clicked.connect(self.accept)
-        
-        cancel_button = QPushButton("❌ Cancelar")
-        cancel_button.clicked.connect(self.reject)
-        cancel_button.setStyleSheet("""
-            QPushButton {
-                background-color: #F44336;
-            }
-            QPushButton:hover {
-                background-color: #D32F2F;
-            }
-            QPushButton:pressed {
-                background-color: #B71C1C;
-            }
-        """)
-        
-        button_layout.addStretch()
-        button_layout.addWidget(ok_button)
-        button_layout.addWidget(cancel_button)
-        
-        layout.addLayout(button_layout)
-        
-        self.resize(500, 400)
+        if description.strip():
+            lines = self.layout_text(description, content_width, 11)
+            current_y = self.draw_text(lines, page_margin, current_y, content_width, 11, 5) + 10
 
-class ImageEditor(QDialog):
-    def __init__(self, image_path, parent=None):
-        super().__init__(parent)
-        self.image_path = image_path
-        self.setWindowTitle("Editor de Imagem")
-        self.setModal(True)
-        
-        # Configurar estilo moderno
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #f5f5f5;
-                font-family: 'Segoe UI', Arial;
-            }
-            QToolBar {
-                background-color: white;
-                border: 1px solid #E0E0E0;
-                border-radius: 4px;
-                padding: 4px;
-                spacing: 4px;
-            }
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #1976D2;
-            }
-            QPushButton:pressed {
-                background-color: #0D47A1;
-            }
-            QLabel {
-                background-color: white;
-                border: 1px solid #E0E0E0;
-                border-radius: 4px;
+        # Imagem
+        if error is None and image is None:
+            return
+        try:
+            if error is not None:
+                raise error
+            img_w, img_h = size
+
+            # Calcular espaço disponível para a imagem
+            available_height = pdf.h - current_y - (2 * page_margin)
+            max_image_height = min(180, available_height)  # Limitar altura máxima
+
+            # Calcular escala mantendo proporção
+            scale = min(content_width/img_w, max_image_height/img_h)
+
+            # Se a imagem for muito pequena, não ampliar além de 150%
+            if scale > 1.5:
+                scale = 1.5
+
+            final_w = img_w * scale
+            final_h = img_h * scale
+
+            # Centralizar horizontalmente
+            x_centered = page_margin + (content_width - final_w) / 2
+
+            # Se a imagem não couber na página atual, criar nova página
+            if current_y + final_h > pdf.h - page_margin:
+                pdf.add_page()
+                current_y = page_margin
+
+            pdf.image(self.image_source(image, key), x=x_centered, y=current_y,
+                      w=final_w, h=final_h)
+
+        except Exception as e:
+            pdf.set_font(self.font_family, 'I', 10)
+            pdf.cell(0, 10, self.text(f'Erro ao carregar imagem: {str(e)}'), 0, 1, 'L')
+
+    def add_compact_step(self, description, image=None, size=None, key=None, error=None):
+        """Layout compacto: etapas em sequência, lado a lado enquanto couberem na linha
+
+        Cada bloco (título, descrição e imagem) é medido antes de ser posicionado e
+        colocado na linha atual da página; não cabendo na largura, abre uma nova
+        linha, e não cabendo na altura, uma nova página (a ordem é preservada).
+        """
+        pdf = self.pdf
+        margin, gap = self.page_margin, self.block_gap
+        right, bottom = pdf.w - margin, pdf.h - margin
+        page_height = bottom - margin
+
+        # Imagem no tamanho natural da captura (96 dpi), nunca ampliada
+        image_w = image_h = 0
+        if error is None and image is not None:
+            image_w, image_h = (pixels * 25.4 / 96 for pixels in size)
+            scale = min(1.0, self.content_width / image_w)
+            image_w, image_h = image_w * scale, image_h * scale
+        width = min(self.content_width, max(image_w, self.min_block_width))
+
+        text_height = 8
+        if description.strip():
+            lines = self.layout_text(description, width, 10)
+            text_height += len(lines) * 5 + 2
+        if error is not None:
+            text_height += 6
+        if text_height + 20 > page_height:
+            # Descrição maior que uma página: a etapa usa o layout normal
+            self.cursor = None
+            self.add_page_step(description, image, size, key, error)
+            self.cursor = None
+            return
+        if image_h > page_height - text_height:
+            scale = (page_height - text_height) / image_h
+            image_w, image_h = image_w * scale, image_h * scale
+        height = text_height + image_h
+
+        self.step_count += 1
+        x, y, shelf_height = self.cursor or (margin, None, 0)
+        if y is not None and x + width > right + 0.01:
+            x, y, shelf_height = margin, y + shelf_height + gap, 0
+        if y is None or y + height > bottom:
+            pdf.add_page()
+            x, y, shelf_height = margin, margin, 0
+
+        # O bloco já foi medido: a quebra automática de página não deve interferir
+        pdf.set_auto_page_break(False)
+
+        # Título da etapa
+        pdf.set_font(self.font_family, 'B', 12)
+        pdf.set_xy(x, y)
+        pdf.cell(width, 8, f'Etapa {self.step_count}', 0, 0, 'L')
+        current_y = y + 8
+
+        # Descrição
+        if description.strip():
+            self.draw_text(lines, x, current_y, width, 10, 5)
+            current_y = y + text_height - (6 if error is not None else 0)
+
+        # Imagem
+        try:
+            if error is not None:
+                raise error
+            if image_h:
+                pdf.image(self.image_source(image, key), x=x + (width - image_w) / 2,
+                          y=current_y, w=image_w, h=image_h)
+        except Exception as e:
+            pdf.set_font(self.font_family, 'I', 10)
+            pdf.set_xy(x, current_y)
+            pdf.cell(width, 6, self.text(f'Erro ao carregar imagem: {str(e)}'), 0, 0, 'L')
+
+        pdf.set_auto_page_break(True, margin=15)
+        self.cursor = (x + width + gap, y, max(shelf_height, height))
+
+    def layout_text(self, text, width, size):
+        """Linhas do texto formatado (parse_rich_text) quebradas para a largura em mm
+
+        Cada linha é (largura ocupada, [(deslocamento x, texto, estilo)]). O resultado
+        fica em cache por texto, fonte e largura: a paginação e as reexportações não
+        medem de novo as descrições que não mudaram.
+        """
+        key = (text, round(width, 3), size, self.font_family, self.mono_family)
+        lines = self.layout_cache.get(key)
+        if lines is None:
+            lines = self.break_lines(text, width, size)
+            self.layout_cache.put(key, lines)
+        return lines
+
+    def break_lines(self, text, width, size):
+        import re
+        pdf = self.pdf
+        available = width - 2 * pdf.c_margin
+        widths = {}
+
+        def measure(value, style):
+            if (value, style) not in widths:
+                self.set_style(style, size)
+                widths[value, style] = pdf.get_string_width(value)
+            return widths[value, style]
+
+        lines = []
+        for kind, marker, runs in parse_rich_text(text):
+            if kind == "bullet" and not self.unicode:
+                marker = "-"
+            # Itens de lista: marcador à esquerda e texto com recuo também nas continuações
+            indent = max(5, measure(marker, "") + 1.5) if marker else 0
+
+            # Palavras: (espaço antes, [(texto, estilo)]); trechos colados formam uma palavra
+            words = []
+            space, glued = 0, False
+            for value, style in runs:
+                for token in re.findall(r"\s+|\S+", self.style_text(value, style)):
+                    if token.isspace():
+                        space, glued = measure(" ", style), False
+                    elif glued:
+                        words[-1][1].append((token, style))
+                    else:
+                        words.append((space, [(token, style)]))
+                        space, glued = 0, True
+
+            # Palavra maior que a linha: cada caractere passa a poder iniciar uma linha
+            units = []
+            for space, pieces in words:
+                if sum(measure(*piece) for piece in pieces) <= available - indent:
+                    units.append((space, pieces))
+                    continue
+                chars = [(char, style) for value, style in pieces for char in value]
+                units += [(space if i == 0 else 0, [char]) for i, char in enumerate(chars)]
+
+            line = [[0, marker, "", measure(marker, "")]] if marker else []
+            x = indent
+            for space, pieces in units:
+                word_width = sum(measure(*piece) for piece in pieces)
+                if x > indent and x + space + word_width > available:
+                    lines.append((x, [tuple(fragment[:3]) for fragment in line]))
+                    line, x = [], indent
+                elif x > indent:
+                    x += space
+                for value, style in pieces:
+                    piece_width = measure(value, style)
+                    last = line[-1] if line else None
+                    gap = x - (last[0] + last[3]) if last else None
+                    # Trechos vizinhos do mesmo estilo viram um único texto
+                    if last and last[2] == style and abs(gap) < 1e-6:
+                        last[1] += value
+                    elif last and last[2] == style and abs(gap - measure(" ", style)) < 1e-6:
+                        last[1] += " " + value
+                    else:
+                        line.append([x, value, style, 0])
+                        last = line[-1]
+                    last[3] = x + piece_width - last[0]
+                    x += piece_width
+            lines.append((x if line else 0, [tuple(fragment[:3]) for fragment in line]))
+        return lines
+
+    def draw_text(self, lines, x, y, width, size, line_height, align='L'):
+        """Desenha as linhas de layout_text a partir de (x, y); retorna o y seguinte"""
+        pdf = self.pdf
+        available = width - 2 * pdf.c_margin
+        for line_width, fragments in lines:
+            if pdf.auto_page_break and y + line_height > pdf.page_break_trigger:
+                pdf.add_page()
+                y = self.page_margin
+            offset = (available - line_width) / 2 if align == 'C' else 0
+            for dx, value, style in fragments:
+                self.set_style(style, size)
+                pdf.set_xy(x + offset + dx, y)
+                pdf.cell(0, line_height, value)
+            y += line_height
+        return y
+
+    def set_style(self, style, size):
+        if style == "C":
+            self.pdf.set_font(self.mono_family, '', size)
+        else:
+            self.pdf.set_font(self.font_family, style, size)
+
+    def style_text(self, value, style):
+        """Texto que a fonte do estilo consegue representar"""
+        if style == "C" and self.mono_family == 'Courier':
+            return value.encode('latin-1', 'replace').decode('latin-1')
+        return self.text(value)
+
+    def image_source(self, image, key):
+        # Registrada diretamente na tabela de imagens do fpdf: pdf.image() não lê o
+        # arquivo nem passa pelo leitor de PNG do fpdf (escrito em Python puro)
+        key = key or image
+        if key not in self.pdf.images:
+            info = dict(image) if isinstance(image, dict) else pdf_image_from_file(image)
+            info["i"] = len(self.pdf.images) + 1
+            self.pdf.images[key] = info
+        return key
+
+    def text(self, value):
+        """Texto que a fonte atual consegue representar"""
+        if self.unicode:
+            return value
+        # Arial embutida: caracteres fora do latin-1 viram '?'
+        return value.encode('latin-1', 'replace').decode('latin-1')
+
+    def output(self, path):
+        # Uma entrada por caractere distinto (o fpdf acrescenta uma a cada uso)
+        for font in self.pdf.fonts.values():
+            if font.get('type') == 'TTF':
+                font['subset'] = _SubsetList(sorted(set(font['subset'])))
+        self.pdf.output(path)
+
+@functools.lru_cache(maxsize=None)
+def web_pdf_available():
+    """True se o pikepdf (opcional) estiver instalado, sem importá-lo"""
+    import importlib.util
+    return importlib.util.find_spec("pikepdf") is not None
+
+def optimize_pdf_for_web(pdf_path):
+    """Reescreve o PDF linearizado ("visualização rápida na web") e com objetos em
+    fluxos comprimidos, para que a primeira página apareça antes do fim do download
+
+    Requer o pikepdf (opcional). Retorna (tamanho antes, tamanho depois) em bytes.
+    """
+    try:
+        import pikepdf
+    except ImportError:
+        raise RuntimeError("A otimização para web requer o pacote 'pikepdf' (pip install pikepdf)")
+
+    before = os.path.getsize(pdf_path)
+    directory = os.path.dirname(os.path.abspath(pdf_path))
+    fd, temp_path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    os.close(fd)
+    try:
+        with pikepdf.open(pdf_path) as pdf:
+            # Tabela de referências cruzada também vira fluxo comprimido
+            pdf.save(temp_path, linearize=True, compress_streams=True,
+                     object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        os.replace(temp_path, pdf_path)
+    except:
+        try:
+            os.remove(temp_path)
+        except:
+            pass
+        raise
+    return before, os.path.getsize(pdf_path)
+
+def describe_size_change(before, after):
+    """Texto com a diferença de tamanho, ex.: '1.2 MB → 0.9 MB (-25%)'"""
+    def size_text(size):
+        return f"{size / (1024 * 1024):.1f} MB" if size >= 1024 * 1024 else f"{size / 1024:.0f} KB"
+    change = (after - before) / before * 100 if before else 0
+    return f"{size_text(before)} → {size_text(after)} ({change:+.0f}%)"
+
+_worker_pool = None
+
+def get_worker_pool():
+    """Retorna o pool de processos compartilhado, criado no primeiro uso"""
+    global _worker_pool
+    if _worker_pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _worker_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _worker_pool
+
+def shutdown_worker_pool():
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.shutdown(wait=False)
+        _worker_pool = None
+
+def new_image_path():
+    """Gera um caminho único na pasta 'images' para uma nova imagem de etapa"""
+    images_dir = os.path.join(current_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    return os.path.join(images_dir, f"step_{uuid.uuid4().hex[:12]}.png")
+
+# Cache de hashes: caminho -> (mtime_ns, tamanho, hash)
+_hash_cache = {}
+
+def file_hash(path):
+    """SHA-256 do arquivo, relido apenas quando mtime ou tamanho mudam"""
+    stat = os.stat(path)
+    cached = _hash_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+# Projeto em arquivo único (.docproj): banco SQLite com as imagens
+# armazenadas uma única vez, indexadas pelo hash do conteúdo
+PROJECT_EXTENSION = ".docproj"
+PROJECT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB NOT NULL);
+    CREATE TABLE IF NOT EXISTS steps (
+        position INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL,
+        image_hash TEXT NOT NULL REFERENCES blobs(hash),
+        image_meta TEXT
+    );
+"""
+
+def _ensure_project_schema(connection):
+    connection.executescript(PROJECT_SCHEMA)
+    # Projetos da versão 1 não tinham os metadados das imagens
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(steps)")}
+    if "image_meta" not in columns:
+        connection.execute("ALTER TABLE steps ADD COLUMN image_meta TEXT")
+
+def blob_cache_path(image_hash):
+    """Local onde uma imagem do projeto é extraída (compartilhado entre projetos)"""
+    return os.path.join(current_dir, 'images', '.blobs', f"{image_hash}.png")
+
+def save_project_file(path, title, description, entries):
+    """Salva o projeto; entries = [{"name", "description", "image_path", "image_hash", "meta"}, ...]
+
+    image_hash é opcional: quando conhecido, a imagem só é lida se o projeto
+    ainda não tiver esse conteúdo. image_path pode ser uma função que devolve
+    o caminho, para que imagens ainda não extraídas só sejam buscadas se preciso.
+    """
+    import json
+    import sqlite3
+    def image_path_of(entry):
+        source = entry["image_path"]
+        return source() if callable(source) else source
+
+    hashes = [entry.get("image_hash") or file_hash(image_path_of(entry)) for entry in entries]
+
+    connection = sqlite3.connect(path)
+    try:
+        with connection:
+            _ensure_project_schema(connection)
+            stored = {row[0] for row in connection.execute("SELECT hash FROM blobs")}
+
+            # Gravar apenas imagens que ainda não existem no projeto
+            for entry, image_hash in zip(entries, hashes):
+                if image_hash not in stored:
+                    with open(image_path_of(entry), "rb") as f:
+                        connection.execute("INSERT INTO blobs (hash, data) VALUES (?, ?)",
+                                           (image_hash, sqlite3.Binary(f.read())))
+                    stored.add(image_hash)
+
+            connection.execute("DELETE FROM steps")
+            connection.executemany(
+                "INSERT INTO steps (position, name, description, image_hash, image_meta) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(i, entry["name"], entry["description"], image_hash,
+                  json.dumps(entry["meta"]) if entry.get("meta") else None)
+                 for i, (entry, image_hash) in enumerate(zip(entries, hashes))]
+            )
+            connection.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT image_hash FROM steps)")
+            connection.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("format_version", "2"), ("title", title), ("description", description)]
+            )
+    finally:
+        connection.close()
+    return hashes
+
+def load_project_file(path):
+    """Carrega apenas os metadados do projeto (as imagens são extraídas sob demanda)"""
+    import json
+    import sqlite3
+    connection = sqlite3.connect(path)
+    try:
+        info = dict(connection.execute("SELECT key, value FROM meta"))
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(steps)")}
+        meta_column = "image_meta" if "image_meta" in columns else "NULL"
+        rows = connection.execute(
+            f"SELECT name, description, image_hash, {meta_column} FROM steps ORDER BY position"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    entries = [{"name": name, "description": description, "image_hash": image_hash,
+                "meta": json.loads(image_meta) if image_meta else None}
+               for name, description, image_hash, image_meta in rows]
+    return info.get("title", "Documentação de Processo"), info.get("description", ""), entries
+
+def extract_project_blob(path, image_hash):
+    """Extrai uma imagem do projeto para o cache local, se ainda não estiver lá"""
+    import sqlite3
+    image_path = blob_cache_path(image_hash)
+    if os.path.exists(image_path):
+        return image_path
+
+    connection = sqlite3.connect(path)
+    try:
+        data = connection.execute("SELECT data FROM blobs WHERE hash = ?",
+                                  (image_hash,)).fetchone()[0]
+    finally:
+        connection.close()
+
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix=".png", dir=os.path.dirname(image_path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, image_path)
+    return image_path
+
+def atomic_write_json(path, data):
+    """Grava o JSON em arquivo temporário e substitui o destino de uma vez"""
+    import json
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding='utf-8') as json_file:
+            json.dump(data, json_file, ensure_ascii=False, indent=4)
+        os.replace(temp_path, path)
+    except:
+        try:
+            os.remove(temp_path)
+        except:
+            pass
+        raise
+
+TEMPLATES_DIR = os.path.join(current_dir, "templates")
+
+# Fragmentos: sequências de etapas gravadas uma única vez e referenciadas pelos
+# templates JSON com {"fragment": nome} no lugar das etapas
+FRAGMENTS_DIR = os.path.join(TEMPLATES_DIR, "fragments")
+
+# Fragmentos já resolvidos: caminho -> (mtime_ns, tamanho, título, etapas)
+_fragment_cache = {}
+
+def fragment_path(name):
+    return os.path.join(FRAGMENTS_DIR, f"{name}.json")
+
+def fragment_name(title):
+    """Nome de arquivo do fragmento a partir do título ("Login e Navegação" -> "login-e-navegacao")"""
+    return "-".join(search_terms(title)) or "fragmento"
+
+def fragment_version(name):
+    """(mtime_ns, tamanho) do arquivo do fragmento, ou None se ele não existir"""
+    try:
+        stat = os.stat(fragment_path(name))
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def resolve_fragment(name):
+    """Versão e etapas do fragmento: ((mtime_ns, tamanho), [{name, description, image_path, meta}])
+
+    O resultado fica em cache enquanto o arquivo do fragmento não mudar; a versão
+    permite que os documentos percebam quando o fragmento foi atualizado.
+    """
+    import json
+    path = fragment_path(name)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _fragment_cache.get(path)
+    if cached is None or cached[:2] != version:
+        with open(path, "r", encoding='utf-8') as json_file:
+            fragment_data = json.load(json_file)
+        steps = [{"name": step_data.get("name", ""), "description": step_data.get("description", ""),
+                  "image_path": os.path.join(FRAGMENTS_DIR, step_data["image_path"]),
+                  "meta": step_data.get("meta")}
+                 for step_data in fragment_data.get("steps", [])]
+        cached = _fragment_cache[path] = version + (fragment_data.get("title", name), steps)
+    return version, cached[3]
+
+def list_fragments():
+    """Fragmentos disponíveis: [(nome, título, número de etapas)]"""
+    fragments = []
+    try:
+        entries = sorted(entry.name for entry in os.scandir(FRAGMENTS_DIR)
+                         if entry.is_file() and entry.name.endswith(".json"))
+    except OSError:
+        return []
+    for file_name in entries:
+        name = file_name[:-len(".json")]
+        try:
+            _, steps = resolve_fragment(name)
+        except Exception:
+            continue
+        fragments.append((name, _fragment_cache[fragment_path(name)][2], len(steps)))
+    return fragments
+
+def save_fragment(name, title, steps):
+    """Grava (ou atualiza) o fragmento; steps = [{name, description, image_path, meta}]
+
+    Imagens que já pertencem ao fragmento não são copiadas de novo. As que ele
+    deixar de usar permanecem na pasta: documentos abertos, diários de
+    recuperação e projetos ainda podem apontar para elas. Todos os documentos
+    que o referenciam passam a usar a nova versão.
+    """
+    import shutil
+    image_dir = os.path.join(FRAGMENTS_DIR, name)
+    os.makedirs(image_dir, exist_ok=True)
+
+    saved_steps = []
+    for step in steps:
+        source = os.path.abspath(step["image_path"])
+        if os.path.dirname(source) == os.path.abspath(image_dir):
+            image_name = os.path.basename(source)
+        else:
+            image_name = f"step_{uuid.uuid4().hex[:12]}.png"
+            shutil.copy2(source, os.path.join(image_dir, image_name))
+        step_data = {"name": step["name"], "description": step["description"],
+                     "image_path": os.path.join(name, image_name)}
+        if step.get("meta"):
+            step_data["meta"] = step["meta"]
+        saved_steps.append(step_data)
+
+    atomic_write_json(fragment_path(name), {"title": title, "steps": saved_steps})
+
+def expand_template_steps(template_steps):
+    """Etapas do template com as referências a fragmentos resolvidas
+
+    Cada etapa de fragmento recebe "fragment" = (nome, posição, total, versão);
+    as demais recebem "fragment" = None.
+    """
+    steps = []
+    for step_data in template_steps:
+        if "fragment" not in step_data:
+            steps.append(dict(step_data, fragment=None))
+            continue
+        name = step_data["fragment"]
+        try:
+            version, fragment_steps = resolve_fragment(name)
+        except OSError:
+            raise FileNotFoundError(f"Fragmento '{name}' não encontrado em {FRAGMENTS_DIR}")
+        for index, fragment_step in enumerate(fragment_steps):
+            steps.append(dict(fragment_step, fragment=(name, index, len(fragment_steps), version)))
+    return steps
+
+def read_template_summary(path):
+    """Lê capa e etapas de um template JSON ou projeto sem carregar as imagens
+
+    "fragments" = {nome: versão} dos fragmentos usados pelo template.
+    """
+    if path.endswith(PROJECT_EXTENSION):
+        title, description, entries = load_project_file(path)
+        steps = [{"name": entry["name"], "description": entry["description"],
+                  "image_path": None, "image_hash": entry["image_hash"]}
+                 for entry in entries]
+        return {"title": title, "description": description, "steps": steps, "fragments": {}}
+
+    import json
+    with open(path, "r", encoding='utf-8') as json_file:
+        template_data = json.load(json_file)
+    cover = template_data.get("cover", {})
+    template_dir = os.path.dirname(path)
+    expanded = expand_template_steps(template_data.get("steps", []))
+    # Etapas de fragmentos já têm o caminho completo da imagem
+    steps = [{"name": step_data.get("name", ""), "description": step_data.get("description", ""),
+              "image_path": os.path.join(template_dir, step_data["image_path"]),
+              "image_hash": None}
+             for step_data in expanded]
+    fragments = {step_data["fragment"][0]: step_data["fragment"][3]
+                 for step_data in expanded if step_data["fragment"]}
+    return {"title": cover.get("title", ""), "description": cover.get("description", ""),
+            "steps": steps, "fragments": fragments}
+
+def list_template_files(directory):
+    """Templates JSON e projetos no primeiro nível da pasta"""
+    try:
+        return [entry.path for entry in os.scandir(directory)
+                if entry.is_file() and entry.name.endswith((".json", PROJECT_EXTENSION))]
+    except OSError:
+        return []
+
+def search_terms(text):
+    """Palavras em minúsculas e sem acentos ("Configuração" -> "configuracao")"""
+    import re
+    import unicodedata
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.findall(r"\w+", text)
+
+class TemplateSearchIndex:
+    """Índice invertido (palavra -> etapas) sobre os templates da biblioteca
+
+    Cada documento é uma etapa (linha >= 0) ou a capa (linha -1) de um template.
+    refresh() compara mtime e tamanho de cada arquivo, e a versão dos fragmentos
+    que ele usa, e reindexa apenas os que mudaram, então pode ser chamado sempre
+    que a pasta (ou a dos fragmentos) for alterada.
+    """
+
+    def __init__(self, directory=TEMPLATES_DIR):
+        self.directory = directory
+        # caminho -> (mtime_ns, tamanho, [(linha, rótulo, texto)], {fragmento: versão})
+        self.files = {}
+        # palavra -> {(caminho, linha)}
+        self.postings = {}
+        self.labels = {}
+        # Vocabulário ordenado para busca por prefixo (refeito só quando muda)
+        self.vocabulary = None
+
+    def refresh(self):
+        current = set()
+        for path in list_template_files(self.directory):
+            current.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            known = self.files.get(path)
+            if (known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size and
+                    all(fragment_version(name) == version for name, version in known[3].items())):
+                continue
+            self.remove_file(path)
+            try:
+                summary = read_template_summary(path)
+            except Exception:
+                # Arquivo inválido ou sendo gravado: será lido na próxima atualização
+                continue
+            self.add_file(path, stat, summary)
+
+        for path in set(self.files) - current:
+            self.remove_file(path)
+
+    def add_file(self, path, stat, summary):
+        title = summary["title"] or os.path.basename(path)
+        documents = [(-1, title, f"{title} {summary['description']}")]
+        for row, step in enumerate(summary["steps"]):
+            documents.append((row, f"{title} › {step['name']}",
+                              f"{step['name']} {step['description']}"))
+
+        for row, label, text in documents:
+            key = (path, row)
+            self.labels[key] = label
+            for term in set(search_terms(text)):
+                self.postings.setdefault(term, set()).add(key)
+        self.files[path] = (stat.st_mtime_ns, stat.st_size, documents, summary["fragments"])
+        self.vocabulary = None
+
+    def remove_file(self, path):
+        known = self.files.pop(path, None)
+        if known is None:
+            return
+        for row, label, text in known[2]:
+            key = (path, row)
+            self.labels.pop(key, None)
+            for term in set(search_terms(text)):
+                keys = self.postings.get(term)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[term]
+        self.vocabulary = None
+
+    def matching(self, prefix):
+        import bisect
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        keys = set()
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for term in self.vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            keys |= self.postings[term]
+        return keys
+
+    def search(self, query, limit=200):
+        """Documentos que contêm todas as palavras da consulta (como prefixo)"""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # Termos mais longos primeiro: costumam ter menos resultados
+        results = None
+        for term in sorted(terms, key=len, reverse=True):
+            keys = self.matching(term)
+            results = keys if results is None else results & keys
+            if not results:
+                return []
+        ordered = sorted(results, key=lambda key: (self.labels[key].lower(), key[1]))
+        return [(path, row, self.labels[(path, row)]) for path, row in ordered[:limit]]
+
+JOURNAL_PATH = os.path.join(current_dir, "images", ".autosave.jsonl")
+
+class AutosaveJournal:
+    """Diário somente-acréscimo das alterações do documento, para recuperação após falhas
+
+    Cada linha é um registro JSON aplicado em ordem sobre o anterior. Um registro
+    "snapshot" contém o documento inteiro e substitui tudo o que veio antes, o que
+    permite compactar o diário reescrevendo-o com um único snapshot.
+    """
+
+    # Acima deste número de registros o diário é compactado imediatamente
+    MAX_RECORDS = 2000
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.file = None
+        # Registros gravados desde o último snapshot
+        self.records = 0
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def append(self, op, **data):
+        import json
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, "a", encoding='utf-8')
+        data["op"] = op
+        self.file.write(json.dumps(data, ensure_ascii=False) + "\n")
+        # Sem fsync: o sistema operacional preserva o arquivo se apenas o programa falhar
+        self.file.flush()
+        self.records += 1
+
+    def compact(self, snapshot):
+        """Substitui o diário por um único snapshot do documento"""
+        import json
+        self.close()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        snapshot["op"] = "snapshot"
+        fd, temp_path = tempfile.mkstemp(suffix=".jsonl", dir=os.path.dirname(self.path))
+        with os.fdopen(fd, "w", encoding='utf-8') as journal_file:
+            journal_file.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temp_path, self.path)
+        self.records = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        self.records = 0
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def replay(self):
+        """Reconstrói (título, descrição, etapas) a partir dos registros gravados"""
+        import json
+        title, description, steps = "Documentação de Processo", "", []
+        with open(self.path, "r", encoding='utf-8') as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Última linha incompleta (falha durante a gravação)
+                    break
+                op = record["op"]
+                if op == "snapshot":
+                    title, description = record["title"], record["description"]
+                    steps = record["steps"]
+                elif op == "cover":
+                    title, description = record["title"], record["description"]
+                elif op == "add":
+                    steps.insert(record["row"], record["step"])
+                elif op == "delete":
+                    del steps[record["row"]]
+                elif op == "move":
+                    steps.insert(record["to"], steps.pop(record["row"]))
+                elif op == "rename":
+                    # Etapa alterada deixa de seguir o fragmento de origem
+                    steps[record["row"]].update(name=record["name"], fragment=None)
+                elif op == "description":
+                    steps[record["row"]].update(description=record["description"], fragment=None)
+                elif op == "image":
+                    steps[record["row"]].update(image_path=record["image_path"],
+                                                owns_image=True, project=None, fragment=None)
+        return title, description, steps
+
+class ImageMeta:
+    """Metadados da imagem de uma etapa, válidos enquanto mtime e tamanho do arquivo não mudarem"""
+    __slots__ = ("width", "height", "byte_size", "content_hash", "mode", "captured_at", "mtime_ns")
+
+    def __init__(self, width, height, byte_size, content_hash, mode, captured_at, mtime_ns):
+        self.width = width
+        self.height = height
+        self.byte_size = byte_size
+        self.content_hash = content_hash
+        self.mode = mode
+        self.captured_at = captured_at
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def from_file(cls, path, captured_at=None):
+        from PIL import Image
+        stat = os.stat(path)
+        # Image.open lê apenas o cabeçalho
+        with Image.open(path) as img:
+            width, height = img.size
+            mode = img.mode
+        return cls(width, height, stat.st_size, file_hash(path), mode,
+                   captured_at or stat.st_mtime, stat.st_mtime_ns)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(**{slot: data.get(slot) for slot in cls.__slots__})
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def matches(self, stat):
+        return self.mtime_ns == stat.st_mtime_ns and self.byte_size == stat.st_size
+
+class Step:
+    # Registro compacto: documentos com milhares de etapas mantêm todas em memória
+    __slots__ = ("_image_path", "_image_loader", "image_hash", "_description", "_name",
+                 "owns_image", "saved_image", "dirty", "meta", "fragment")
+
+    # Partes de uma etapa cujas alterações são rastreadas entre salvamentos
+    # (também desfazem o vínculo com o fragmento de origem)
+    TRACKED = ("image", "description", "name")
+
+    def __init__(self, image_path, description, owns_image=True, name="", image_loader=None):
+        self._image_path = image_path
+        # Função que disponibiliza a imagem em disco no primeiro acesso a image_path
+        self._image_loader = image_loader
+        # Hash do conteúdo, quando conhecido sem precisar ler o arquivo
+        self.image_hash = None
+        self._description = description
+        self._name = name
+        # False quando a imagem é compartilhada (ex.: cache do projeto) e não deve
+        # ser alterada nem apagada diretamente
+        self.owns_image = owns_image
+        # Arquivo de imagem no último template salvo/carregado
+        self.saved_image = None
+        self.dirty = set(self.TRACKED)
+        # Metadados da imagem mantidos junto da etapa
+        self.meta = None
+        # Origem em um fragmento: (nome, posição, total de etapas, versão) ou None
+        self.fragment = None
+
+    @property
+    def image_path(self):
+        if self._image_loader is not None:
+            self._image_path = self._image_loader()
+            self._image_loader = None
+        return self._image_path
+
+    @image_path.setter
+    def image_path(self, value):
+        # Marcado mesmo com o mesmo caminho: a imagem pode ter sido regravada
+        self._image_path = value
+        self._image_loader = None
+        self.image_hash = None
+        self.dirty.add("image")
+
+    @property
+    def is_loaded(self):
+        """False enquanto a imagem ainda não foi disponibilizada em disco"""
+        return self._image_loader is None
+
+    @property
+    def image_loader(self):
+        return self._image_loader
+
+    def finish_loading(self, loader, image_path):
+        """Registra a imagem extraída em segundo plano, se a etapa não mudou nesse meio tempo"""
+        if self._image_loader is loader:
+            self._image_path = image_path
+            self._image_loader = None
+
+    @property
+    def description(self):
+        return self._description
+
+    @description.setter
+    def description(self, value):
+        if value != self._description:
+            self._description = value
+            self.dirty.add("description")
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if value != self._name:
+            self._name = value
+            self.dirty.add("name")
+
+    def ensure_meta(self):
+        """Metadados atuais da imagem, recalculados apenas se o arquivo mudou"""
+        meta = self.meta
+        # Imagem inalterada desde que foi carregada de um projeto (conteúdo pelo hash)
+        if meta is not None and self.image_hash is not None and meta.content_hash == self.image_hash:
+            return meta
+
+        path = self.image_path
+        stat = os.stat(path)
+        if meta is None or not meta.matches(stat):
+            self.meta = meta = ImageMeta.from_file(path, meta.captured_at if meta else None)
+        else:
+            # Evita reler o arquivo quando o hash for pedido depois
+            _hash_cache[path] = (stat.st_mtime_ns, stat.st_size, meta.content_hash)
+        return meta
+
+    def mark_saved(self, saved_image):
+        self.saved_image = saved_image
+        self.dirty.clear()
+
+class CoverDialog(QDialog):
+    def __init__(self, title="", description="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Editar Capa")
+        self.setModal(True)
+        
+        # Configurar estilo moderno
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
             }
-            QSpinBox {
+            QLabel {
+                color: #424242;
+                font-weight: bold;
+                font-size: 12px;
+            }
+            QLineEdit, QTextEdit {
                 background-color: white;
                 border: 1px solid #E0E0E0;
                 border-radius: 4px;
-                padding: 4px;
+                padding: 8px;
+                font-size: 12px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+            QPushButton:pressed {
+                background-color: #0D47A1;
             }
         """)
         
-        # Carregar imagem
-        self.original_pixmap = QPixmap(image_path)
-        self.edited_pixmap = self.original_pixmap.copy()
-        
-        # Configurações de desenho
-        self.current_tool = "pen"
-        self.pen_color = QColor(255, 0, 0)  # Vermelho
-        self.pen_width = 3
-        self.drawing = False
-        self.last_point = QPoint()
-        self.start_point = QPoint()
-        self.font_size = 12  # Tamanho padrão da fonte
-        
-        # Histórico para desfazer
-        self.history = [self.edited_pixmap.copy()]
-        self.history_index = 0
-        
-        self.init_ui()
-        
-    def init_ui(self):
+        # Layout principal
         layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
         
-        # Toolbar
-        toolbar = self.create_toolbar()
-        layout.addWidget(toolbar)
+        # Título
+        title_label = QLabel("📑 Título:")
+        self.title_edit = QLineEdit(title)
+        self.title_edit.setPlaceholderText("Digite o título da documentação")
+        layout.addWidget(title_label)
+        layout.addWidget(self.title_edit)
         
-        # Label para mostrar imagem
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setStyleSheet("border: 1px solid gray;")
-        self.image_label.setMinimumSize(600, 400)
-        self.update_image_display()
-        layout.addWidget(self.image_label)
+        # Descrição
+        desc_label = QLabel("📝 Descrição:")
+        self.desc_edit = QTextEdit()
+        self.desc_edit.setPlaceholderText("Digite a descrição da documentação")
+        self.desc_edit.setText(description)
+        self.desc_edit.setMinimumHeight(100)
+        layout.addWidget(desc_label)
+        layout.addWidget(self.desc_edit)
         
         # Botões
         button_layout = QHBoxLayout()
+        button_layout.setSpacing(10)
         
-        save_btn = QPushButton("Salvar")
-        save_btn.clicked.connect(self.save_image)
-        cancel_btn = QPushButton("Cancelar")
-        cancel_btn.clicked.connect(self.reject)
+        ok_button = QPushButton("✅ Salvar")
+        ok_button.clicked.connect(self.accept)
         
-        button_layout.addStretch()
-        button_layout.addWidget(save_btn)
-        button_layout.addWidget(cancel_btn)
-        
-        layout.addLayout(button_layout)
-        
-        self.resize(800, 700)
+        cancel_button = QPushButton("❌ Cancelar")
+        cancel_button.clicked.connect(self.reject)
+        cancel_button.setStyleSheet("""
+            QPushButton {
+                background-color: #F44336;
+            }
+            QPushButton:hover {
+                background-color: #D32F2F;
+            }
+            QPushButton:pressed {
+                background-color: #B71C1C;
+            }
+        """)
         
-    def create_toolbar(self):
-        toolbar = QToolBar()
-        toolbar.setMovable(False)
+        button_layout.addStretch()
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
         
-        # Grupo de ferramentas
-        tool_group = QButtonGroup(self)
+        layout.addLayout(button_layout)
         
-        # Estilo para botões de ferramenta
-        tool_button_style = """
+        self.resize(500, 400)
+
+class StepPickerDialog(QDialog):
+    def __init__(self, choices, title="Selecionar Etapas", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setModal(True)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QListWidget {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 4px;
+            }
             QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        # Lista de etapas com caixas de seleção (choices = [(índice, nome), ...])
+        self.list_widget = QListWidget()
+        for index, name in choices:
+            item = QListWidgetItem(name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            item.setData(Qt.UserRole, index)
+            self.list_widget.addItem(item)
+        layout.addWidget(self.list_widget)
+
+        button_layout = QHBoxLayout()
+        all_button = QPushButton("☑️ Todas")
+        all_button.clicked.connect(self.check_all)
+        ok_button = QPushButton("✅ Aplicar")
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("❌ Cancelar")
+        cancel_button.clicked.connect(self.reject)
+
+        button_layout.addWidget(all_button)
+        button_layout.addStretch()
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+        self.resize(400, 450)
+
+    def check_all(self):
+        for i in range(self.list_widget.count()):
+            self.list_widget.item(i).setCheckState(Qt.Checked)
+
+    def selected_indices(self):
+        return [self.list_widget.item(i).data(Qt.UserRole)
+                for i in range(self.list_widget.count())
+                if self.list_widget.item(i).checkState() == Qt.Checked]
+
+class BatchOperationsDialog(QDialog):
+    def __init__(self, preview_path=None, parent=None):
+        super().__init__(parent)
+        self.preview_path = preview_path
+        self.border_color = QColor(0, 0, 0)
+        self.setWindowTitle("Operações em Lote")
+        self.setModal(True)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QLabel {
+                color: #424242;
+            }
+            QLineEdit, QSpinBox {
                 background-color: white;
                 border: 1px solid #E0E0E0;
                 border-radius: 4px;
-                padding: 8px;
+                padding: 4px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        grid = QGridLayout()
+
+        # Recortar bordas
+        self.crop_check = QCheckBox("✂️ Recortar bordas (px)")
+        self.crop_spins = {}
+        grid.addWidget(self.crop_check, 0, 0)
+        for column, (key, label) in enumerate([("left", "Esq."), ("top", "Topo"),
+                                                ("right", "Dir."), ("bottom", "Base")]):
+            spin = QSpinBox()
+            spin.setRange(0, 2000)
+            spin.setPrefix(f"{label} ")
+            self.crop_spins[key] = spin
+            grid.addWidget(spin, 0, column + 1)
+
+        # Redimensionar
+        self.resize_check = QCheckBox("📐 Redimensionar")
+        self.max_width_spin = QSpinBox()
+        self.max_width_spin.setRange(50, 10000)
+        self.max_width_spin.setValue(1280)
+        self.max_width_spin.setPrefix("Largura máx. ")
+        grid.addWidget(self.resize_check, 1, 0)
+        grid.addWidget(self.max_width_spin, 1, 1, 1, 2)
+
+        # Marca d'água
+        self.watermark_check = QCheckBox("💧 Marca d'água")
+        self.watermark_edit = QLineEdit("Confidencial")
+        self.opacity_spin = QSpinBox()
+        self.opacity_spin.setRange(5, 100)
+        self.opacity_spin.setValue(50)
+        self.opacity_spin.setSuffix(" %")
+        grid.addWidget(self.watermark_check, 2, 0)
+        grid.addWidget(self.watermark_edit, 2, 1, 1, 2)
+        grid.addWidget(self.opacity_spin, 2, 3)
+
+        # Borda
+        self.border_check = QCheckBox("🖼️ Borda")
+        self.border_spin = QSpinBox()
+        self.border_spin.setRange(1, 100)
+        self.border_spin.setValue(4)
+        self.border_spin.setSuffix(" px")
+        self.border_color_btn = QPushButton("🎨 Cor")
+        self.border_color_btn.clicked.connect(self.choose_border_color)
+        grid.addWidget(self.border_check, 3, 0)
+        grid.addWidget(self.border_spin, 3, 1)
+        grid.addWidget(self.border_color_btn, 3, 2)
+
+        layout.addLayout(grid)
+
+        self.dry_run_check = QCheckBox("Simular (apenas mostrar o resultado, sem alterar arquivos)")
+        layout.addWidget(self.dry_run_check)
+
+        # Pré-visualização da etapa atual
+        self.preview_label = QLabel("Clique em Pré-visualizar para ver o resultado")
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setMinimumSize(400, 250)
+        self.preview_label.setStyleSheet("background-color: white; border: 1px solid #E0E0E0;")
+        layout.addWidget(self.preview_label)
+
+        button_layout = QHBoxLayout()
+        preview_button = QPushButton("👁️ Pré-visualizar")
+        preview_button.clicked.connect(self.preview)
+        ok_button = QPushButton("✅ Aplicar")
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("❌ Cancelar")
+        cancel_button.clicked.connect(self.reject)
+
+        button_layout.addWidget(preview_button)
+        button_layout.addStretch()
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+        self.resize(600, 550)
+
+    def choose_border_color(self):
+        color = QColorDialog.getColor(self.border_color, self)
+        if color.isValid():
+            self.border_color = color
+
+    def operations(self):
+        operations = []
+        if self.crop_check.isChecked():
+            operations.append(("crop", {key: spin.value() for key, spin in self.crop_spins.items()}))
+        if self.resize_check.isChecked():
+            operations.append(("resize", {"max_width": self.max_width_spin.value()}))
+        if self.watermark_check.isChecked() and self.watermark_edit.text().strip():
+            operations.append(("watermark", {"text": self.watermark_edit.text(),
+                                             "opacity": self.opacity_spin.value()}))
+        if self.border_check.isChecked():
+            operations.append(("border", {"width": self.border_spin.value(),
+                                          "color": self.border_color.name()}))
+        return operations
+
+    def preview(self):
+        if not self.preview_path or not os.path.exists(self.preview_path):
+            self.preview_label.setText("Nenhuma imagem para pré-visualizar")
+            return
+        try:
+            from PIL import Image
+            img = Image.open(self.preview_path)
+            img.load()
+            img = apply_image_operations(img, self.operations())
+            pixmap = pil_to_qpixmap(img)
+            self.preview_label.setPixmap(pixmap.scaled(
+                self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
+            ))
+        except Exception as e:
+            self.preview_label.setText(f"Erro na pré-visualização: {str(e)}")
+
+class ChangeReviewDialog(QDialog):
+    """Revisão dos destaques propostos: proposals = [(etapa, número da etapa, caixas)]
+
+    Cada caixa é um item marcável; a pré-visualização mostra as caixas marcadas
+    em vermelho e as desmarcadas tracejadas.
+    """
+    def __init__(self, proposals, note="", parent=None):
+        super().__init__(parent)
+        self.proposals = proposals
+        self.pen_color = QColor(255, 0, 0)
+        self.preview_row = None
+        self.preview_pixmap = None
+        self.setWindowTitle("Destacar Mudanças")
+        self.setModal(True)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QLabel {
                 color: #424242;
             }
-            QPushButton:checked {
-                background-color: #E3F2FD;
-                border-color: #2196F3;
-                color: #1976D2;
+            QListWidget, QSpinBox {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 4px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
             }
             QPushButton:hover {
-                background-color: #F5F5F5;
+                background-color: #1976D2;
             }
-        """
-        
-        # Ferramenta Caneta
-        pen_action = QAction("✏️ Caneta", self)
-        pen_action.setCheckable(True)
-        pen_action.setChecked(True)
-        pen_action.triggered.connect(lambda: self.set_tool("pen"))
-        toolbar.addAction(pen_action)
-        tool_group.addButton(toolbar.widgetForAction(pen_action))
-        
-        # Ferramenta Linha
-        line_action = QAction("📏 Linha", self)
-        line_action.setCheckable(True)
-        line_action.triggered.connect(lambda: self.set_tool("line"))
-        toolbar.addAction(line_action)
-        tool_group.addButton(toolbar.widgetForAction(line_action))
-        
-        # Ferramenta Retângulo
-        rect_action = QAction("⬜ Retângulo", self)
-        rect_action.setCheckable(True)
-        rect_action.triggered.connect(lambda: self.set_tool("rectangle"))
-        toolbar.addAction(rect_action)
-        tool_group.addButton(toolbar.widgetForAction(rect_action))
-        
-        # Ferramenta Seta
-        arrow_action = QAction("➡️ Seta", self)
-        arrow_action.setCheckable(True)
-        arrow_action.triggered.connect(lambda: self.set_tool("arrow"))
-        toolbar.addAction(arrow_action)
-        tool_group.addButton(toolbar.widgetForAction(arrow_action))
-        
-        # Ferramenta Texto
-        text_action = QAction("🔤 Texto", self)
-        text_action.setCheckable(True)
-        text_action.triggered.connect(lambda: self.set_tool("text"))
-        toolbar.addAction(text_action)
-        tool_group.addButton(toolbar.widgetForAction(text_action))
-        
-        toolbar.addSeparator()
-        
-        # Cor
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.addWidget(QLabel("Áreas que mudaram em relação à etapa anterior. "
+                                "Desmarque as que não devem ser destacadas.\n"
+                                "Destaques já desenhados na etapa anterior também contam como mudança."))
+        if note:
+            note_label = QLabel(note)
+            note_label.setStyleSheet("color: #757575;")
+            layout.addWidget(note_label)
+
+        content = QHBoxLayout()
+        self.box_list = QListWidget()
+        self.box_list.setMinimumWidth(260)
+        for index, (step, number, boxes) in enumerate(proposals):
+            for box_index, (x0, y0, x1, y1) in enumerate(boxes):
+                item = QListWidgetItem(f"Etapa {number} · {step.name} — {x1 - x0}×{y1 - y0} em ({x0}, {y0})")
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked)
+                item.setData(Qt.UserRole, (index, box_index))
+                self.box_list.addItem(item)
+        self.box_list.currentItemChanged.connect(lambda current, previous: self.update_preview())
+        self.box_list.itemChanged.connect(lambda item: self.update_preview())
+        content.addWidget(self.box_list)
+
+        self.preview_label = QLabel()
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setMinimumSize(480, 320)
+        self.preview_label.setStyleSheet("background-color: white; border: 1px solid #E0E0E0;")
+        content.addWidget(self.preview_label, 1)
+        layout.addLayout(content)
+
+        options = QHBoxLayout()
         color_btn = QPushButton("🎨 Cor")
         color_btn.clicked.connect(self.choose_color)
-        color_btn.setStyleSheet(tool_button_style)
-        toolbar.addWidget(color_btn)
-        
-        # Espessura
-        toolbar.addWidget(QLabel("Espessura:"))
         self.width_spin = QSpinBox()
         self.width_spin.setRange(1, 20)
         self.width_spin.setValue(3)
-        self.width_spin.valueChanged.connect(self.set_pen_width)
-        toolbar.addWidget(self.width_spin)
-        
-        # Tamanho da fonte (apenas quando a ferramenta texto está selecionada)
-        toolbar.addSeparator()
-        toolbar.addWidget(QLabel("Tamanho do Texto:"))
-        self.font_size_spin = QSpinBox()
-        self.font_size_spin.setRange(8, 72)
-        self.font_size_spin.setValue(self.font_size)
-        self.font_size_spin.valueChanged.connect(self.set_font_size)
-        self.font_size_spin.setEnabled(False)  # Inicialmente desabilitado
-        toolbar.addWidget(self.font_size_spin)
+        self.width_spin.setSuffix(" px")
+        self.width_spin.valueChanged.connect(lambda value: self.update_preview())
+        options.addWidget(color_btn)
+        options.addWidget(QLabel("Espessura:"))
+        options.addWidget(self.width_spin)
+        options.addStretch()
+        layout.addLayout(options)
+
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("✅ Aplicar")
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("❌ Cancelar")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+        self.resize(900, 560)
+        if self.box_list.count():
+            self.box_list.setCurrentRow(0)
+
+    def choose_color(self):
+        color = QColorDialog.getColor(self.pen_color, self)
+        if color.isValid():
+            self.pen_color = color
+            self.update_preview()
+
+    def checked_boxes(self, index):
+        boxes = []
+        for row in range(self.box_list.count()):
+            item = self.box_list.item(row)
+            proposal, box_index = item.data(Qt.UserRole)
+            if proposal == index and item.checkState() == Qt.Checked:
+                boxes.append(self.proposals[index][2][box_index])
+        return boxes
+
+    def update_preview(self):
+        item = self.box_list.currentItem()
+        if item is None:
+            return
+        index, current_box = item.data(Qt.UserRole)
+        step, _, boxes = self.proposals[index]
+        if self.preview_row != index:
+            self.preview_row = index
+            self.preview_pixmap = QPixmap(step.image_path)
+        if self.preview_pixmap.isNull():
+            self.preview_label.setText("Imagem não encontrada")
+            return
+
+        pixmap = self.preview_pixmap.copy()
+        painter = QPainter(pixmap)
+        checked = self.checked_boxes(index)
+        for box_index, (x0, y0, x1, y1) in enumerate(boxes):
+            if boxes[box_index] in checked:
+                pen = QPen(self.pen_color, self.width_spin.value())
+            else:
+                pen = QPen(QColor(120, 120, 120), 1, Qt.DashLine)
+            if box_index == current_box:
+                # Caixa selecionada na lista um pouco mais grossa
+                pen.setWidth(pen.width() + 2)
+            painter.setPen(pen)
+            painter.drawRect(QRect(QPoint(x0, y0), QPoint(x1, y1)))
+        painter.end()
+        self.preview_label.setPixmap(pixmap.scaled(
+            self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
+        ))
+
+    def step_operations(self):
+        """Operações de cada etapa com caixas aceitas, no formato de apply_image_operations"""
+        operations = {}
+        for index, (step, _, _) in enumerate(self.proposals):
+            boxes = self.checked_boxes(index)
+            if boxes:
+                operations[step] = [("rectangles", {"boxes": boxes, "color": self.pen_color.name(),
+                                                    "width": self.width_spin.value()})]
+        return operations
+
+class ImageEditor(QDialog):
+    def __init__(self, image_path, parent=None, step_choices=None, save_path=None):
+        super().__init__(parent)
+        self.image_path = image_path
+        self.save_path = save_path or image_path
+        # Outras etapas que podem receber a mesma ocultação em lote
+        self.step_choices = step_choices or []
+        self.last_redaction = None
+        self.batch_redaction = None
+        self.setWindowTitle("Editor de Imagem")
+        self.setModal(True)
         
+        # Configurar estilo moderno
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QToolBar {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 4px;
+                spacing: 4px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+            QPushButton:pressed {
+                background-color: #0D47A1;
+            }
+            QLabel {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+            }
+            QSpinBox {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 4px;
+            }
+        """)
+        
+        # Carregar imagem
+        self.original_pixmap = QPixmap(image_path)
+        self.edited_pixmap = self.original_pixmap.copy()
+        
+        # Configurações de desenho
+        self.current_tool = "pen"
+        self.pen_color = QColor(255, 0, 0)  # Vermelho
+        self.pen_width = 3
+        self.drawing = False
+        self.last_point = QPoint()
+        self.start_point = QPoint()
+        self.font_size = 12  # Tamanho padrão da fonte
+        self.redaction_strength = 12  # Bloco da pixelização / raio do desfoque
+
+        # Histórico para desfazer
+        self.history = [self.edited_pixmap.copy()]
+        self.history_index = 0
+        
+        self.init_ui()
+        
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        
+        # Toolbar
+        toolbar = self.create_toolbar()
+        layout.addWidget(toolbar)
+        
+        # Label para mostrar imagem
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setStyleSheet("border: 1px solid gray;")
+        self.image_label.setMinimumSize(600, 400)
+        self.update_image_display()
+        layout.addWidget(self.image_label)
+        
+        # Botões
+        button_layout = QHBoxLayout()
+        
+        save_btn = QPushButton("Salvar")
+        save_btn.clicked.connect(self.save_image)
+        cancel_btn = QPushButton("Cancelar")
+        cancel_btn.clicked.connect(self.reject)
+        
+        button_layout.addStretch()
+        button_layout.addWidget(save_btn)
+        button_layout.addWidget(cancel_btn)
+        
+        layout.addLayout(button_layout)
+        
+        self.resize(800, 700)
+        
+    def create_toolbar(self):
+        toolbar = QToolBar()
+        toolbar.setMovable(False)
+        
+        # Grupo de ferramentas
+        tool_group = QButtonGroup(self)
+        
+        # Estilo para botões de ferramenta
+        tool_button_style = """
+            QPushButton {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 8px;
+                color: #424242;
+            }
+            QPushButton:checked {
+                background-color: #E3F2FD;
+                border-color: #2196F3;
+                color: #1976D2;
+            }
+            QPushButton:hover {
+                background-color: #F5F5F5;
+            }
+        """
+        
+        # Ferramenta Caneta
+        pen_action = QAction("✏️ Caneta", self)
+        pen_action.setCheckable(True)
+        pen_action.setChecked(True)
+        pen_action.triggered.connect(lambda: self.set_tool("pen"))
+        toolbar.addAction(pen_action)
+        tool_group.addButton(toolbar.widgetForAction(pen_action))
+        
+        # Ferramenta Linha
+        line_action = QAction("📏 Linha", self)
+        line_action.setCheckable(True)
+        line_action.triggered.connect(lambda: self.set_tool("line"))
+        toolbar.addAction(line_action)
+        tool_group.addButton(toolbar.widgetForAction(line_action))
+        
+        # Ferramenta Retângulo
+        rect_action = QAction("⬜ Retângulo", self)
+        rect_action.setCheckable(True)
+        rect_action.triggered.connect(lambda: self.set_tool("rectangle"))
+        toolbar.addAction(rect_action)
+        tool_group.addButton(toolbar.widgetForAction(rect_action))
+        
+        # Ferramenta Seta
+        arrow_action = QAction("➡️ Seta", self)
+        arrow_action.setCheckable(True)
+        arrow_action.triggered.connect(lambda: self.set_tool("arrow"))
+        toolbar.addAction(arrow_action)
+        tool_group.addButton(toolbar.widgetForAction(arrow_action))
+        
+        # Ferramenta Texto
+        text_action = QAction("🔤 Texto", self)
+        text_action.setCheckable(True)
+        text_action.triggered.connect(lambda: self.set_tool("text"))
+        toolbar.addAction(text_action)
+        tool_group.addButton(toolbar.widgetForAction(text_action))
+
+        # Ferramenta Desfoque
+        blur_action = QAction("💧 Desfocar", self)
+        blur_action.setCheckable(True)
+        blur_action.triggered.connect(lambda: self.set_tool("blur"))
+        toolbar.addAction(blur_action)
+        tool_group.addButton(toolbar.widgetForAction(blur_action))
+
+        # Ferramenta Pixelizar
+        pixelate_action = QAction("▦ Pixelizar", self)
+        pixelate_action.setCheckable(True)
+        pixelate_action.triggered.connect(lambda: self.set_tool("pixelate"))
+        toolbar.addAction(pixelate_action)
+        tool_group.addButton(toolbar.widgetForAction(pixelate_action))
+
         toolbar.addSeparator()
         
+        # Cor
+        color_btn = QPushButton("🎨 Cor")
+        color_btn.clicked.connect(self.choose_color)
+        color_btn.setStyleSheet(tool_button_style)
+        toolbar.addWidget(color_btn)
+        
+        # Espessura
+        toolbar.addWidget(QLabel("Espessura:"))
+        self.width_spin = QSpinBox()
+        self.width_spin.setRange(1, 20)
+        self.width_spin.setValue(3)
+        self.width_spin.valueChanged.connect(self.set_pen_width)
+        toolbar.addWidget(self.width_spin)
+        
+        # Tamanho da fonte (apenas quando a ferramenta texto está selecionada)
+        toolbar.addSeparator()
+        toolbar.addWidget(QLabel("Tamanho do Texto:"))
+        self.font_size_spin = QSpinBox()
+        self.font_size_spin.setRange(8, 72)
+        self.font_size_spin.setValue(self.font_size)
+        self.font_size_spin.valueChanged.connect(self.set_font_size)
+        self.font_size_spin.setEnabled(False)  # Inicialmente desabilitado
+        toolbar.addWidget(self.font_size_spin)
+
+        # Intensidade da ocultação (apenas para desfoque e pixelização)
+        toolbar.addWidget(QLabel("Intensidade:"))
+        self.strength_spin = QSpinBox()
+        self.strength_spin.setRange(2, 64)
+        self.strength_spin.setValue(self.redaction_strength)
+        self.strength_spin.valueChanged.connect(self.set_redaction_strength)
+        self.strength_spin.setEnabled(False)
+        toolbar.addWidget(self.strength_spin)
+
+        # Aplicar a última ocultação em outras etapas
+        self.batch_action = QAction("📑 Aplicar em etapas...", self)
+        self.batch_action.triggered.connect(self.choose_batch_steps)
+        self.batch_action.setEnabled(False)
+        toolbar.addAction(self.batch_action)
+
+        toolbar.addSeparator()
+
         # Desfazer
         undo_action = QAction("↶ Desfazer", self)
         undo_action.triggered.connect(self.undo)
@@ -347,7 +2648,8 @@ class ImageEditor(QDialog):
         self.current_tool = tool
         # Habilitar/desabilitar controle de tamanho da fonte
         self.font_size_spin.setEnabled(tool == "text")
-        
+        self.strength_spin.setEnabled(tool in ("blur", "pixelate"))
+
     def choose_color(self):
         color = QColorDialog.getColor(self.pen_color, self)
         if color.isValid():
@@ -358,7 +2660,11 @@ class ImageEditor(QDialog):
         
     def set_font_size(self, size):
         self.font_size = size
-        
+
+    def set_redaction_strength(self, strength):
+        self.redaction_strength = strength
+
+    @traced("editor.redraw")
     def update_image_display(self):
         # Redimensionar imagem para caber na tela
         scaled_pixmap = self.edited_pixmap.scaled(
@@ -440,7 +2746,9 @@ class ImageEditor(QDialog):
                     self.draw_rectangle(self.start_point, end_point)
                 elif self.current_tool == "arrow":
                     self.draw_arrow(self.start_point, end_point)
-                    
+                elif self.current_tool in ("blur", "pixelate"):
+                    self.apply_redaction(self.start_point, end_point)
+
             self.drawing = False
             self.save_to_history()
             
@@ -490,7 +2798,41 @@ class ImageEditor(QDialog):
         
         painter.end()
         self.update_image_display()
-        
+
+    def apply_redaction(self, start, end):
+        rect = QRect(start, end).normalized().intersected(self.edited_pixmap.rect())
+        if rect.isEmpty():
+            return
+
+        # Processar apenas a área selecionada, não a imagem inteira
+        region = qimage_to_array(self.edited_pixmap.copy(rect).toImage())
+        redact_region(region, (0, 0, rect.width(), rect.height()),
+                      self.current_tool, self.redaction_strength)
+
+        painter = QPainter(self.edited_pixmap)
+        painter.drawImage(rect.topLeft(), array_to_qimage(region))
+        painter.end()
+
+        self.last_redaction = (
+            self.current_tool,
+            (rect.left(), rect.top(), rect.right() + 1, rect.bottom() + 1),
+            self.redaction_strength
+        )
+        self.batch_action.setEnabled(bool(self.step_choices))
+        self.update_image_display()
+
+    def choose_batch_steps(self):
+        if not self.last_redaction:
+            return
+        dialog = StepPickerDialog(self.step_choices, "Aplicar ocultação em etapas", self)
+        if dialog.exec_() == QDialog.Accepted:
+            indices = dialog.selected_indices()
+            if indices:
+                # Aplicado pelo DocCreator quando o editor for salvo
+                self.batch_redaction = self.last_redaction + (indices,)
+                QMessageBox.information(self, "Ocultação em lote",
+                                        f"A ocultação será aplicada em {len(indices)} etapa(s) ao salvar.")
+
     def add_text(self, x, y):
         text, ok = QInputDialog.getText(self, "Adicionar Texto", "Digite o texto:")
         if ok and text:
@@ -532,139 +2874,1210 @@ class ImageEditor(QDialog):
             self.save_to_history()
             
     def save_image(self):
-        self.edited_pixmap.save(self.image_path)
+        self.edited_pixmap.save(self.save_path)
         self.accept()
 
-class RegionSelector(QWidget):
-    selection_finished = pyqtSignal()
-    
+class RegionSelector(QWidget):
+    selection_finished = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        
+        # Configurar para tela cheia
+        desktop = QDesktopWidget()
+        screen_rect = desktop.screenGeometry()
+        self.setGeometry(screen_rect)
+        
+        # Capturar screenshot
+        from PIL import ImageGrab
+        with tracer.span("capture.grab"):
+            self.screenshot = ImageGrab.grab()
+        with tracer.span("capture.convert"):
+            self.pixmap = pil_to_qpixmap(self.screenshot)
+        
+        # Variáveis para seleção
+        self.start_point = QPoint()
+        self.end_point = QPoint()
+        self.selecting = False
+        self.selected_rect = QRect()
+        
+        # Configurar cursor
+        self.setCursor(Qt.CrossCursor)
+        
+        # Mostrar instruções
+        self.show_instructions = True
+        
+        # Configurar estilo
+        self.setStyleSheet("""
+            QWidget {
+                font-family: 'Segoe UI', Arial;
+            }
+        """)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        
+        # Desenhar o screenshot
+        painter.drawPixmap(self.rect(), self.pixmap)
+        
+        # Desenhar overlay escuro com efeito de gradiente
+        overlay_color = QColor(0, 0, 0, 100)  # Preto com transparência
+        painter.fillRect(self.rect(), overlay_color)
+        
+        # Se estamos selecionando, desenhar retângulo
+        if self.selecting and not self.start_point.isNull() and not self.end_point.isNull():
+            selection_rect = QRect(self.start_point, self.end_point).normalized()
+            
+            # Desenhar área selecionada sem overlay
+            painter.drawPixmap(selection_rect, self.pixmap, selection_rect)
+            
+            # Desenhar borda da seleção com efeito de brilho
+            pen = QPen(QColor(33, 150, 243), 2, Qt.SolidLine)  # Azul Material Design
+            painter.setPen(pen)
+            painter.drawRect(selection_rect)
+            
+            # Desenhar dimensões
+            dimensions = f"{selection_rect.width()} x {selection_rect.height()}"
+            font = QFont("Segoe UI", 10)
+            painter.setFont(font)
+            painter.setPen(QPen(QColor(255, 255, 255)))
+            
+            # Desenhar fundo para o texto
+            text_rect = painter.fontMetrics().boundingRect(dimensions)
+            text_rect.moveTop(selection_rect.top() - text_rect.height() - 5)
+            text_rect.moveLeft(selection_rect.left())
+            painter.fillRect(text_rect, QColor(33, 150, 243, 200))
+            
+            # Desenhar texto
+            painter.drawText(text_rect, Qt.AlignCenter, dimensions)
+        
+        # Desenhar instruções com estilo moderno
+        if self.show_instructions:
+            painter.setPen(QPen(QColor(255, 255, 255)))
+            painter.setFont(QFont("Segoe UI", 14, QFont.Bold))
+            
+            # Desenhar fundo para as instruções
+            instruction_text = "Clique e arraste para selecionar uma área da tela. Pressione ESC para cancelar."
+            text_rect = painter.fontMetrics().boundingRect(instruction_text)
+            text_rect.moveTop(20)
+            text_rect.moveLeft(20)
+            text_rect.adjust(-10, -5, 10, 5)  # Adicionar padding
+            
+            # Desenhar fundo com efeito de vidro
+            painter.fillRect(text_rect, QColor(0, 0, 0, 150))
+            painter.drawRect(text_rect)
+            
+            # Desenhar texto
+            painter.drawText(30, 40, instruction_text)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.start_point = event.pos()
+            self.end_point = event.pos()
+            self.selecting = True
+            self.show_instructions = False
+            self.update()
+
+    def mouseMoveEvent(self, event):
+        if self.selecting:
+            self.end_point = event.pos()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton and self.selecting:
+            self.end_point = event.pos()
+            self.selected_rect = QRect(self.start_point, self.end_point).normalized()
+            self.selecting = False
+            self.selection_finished.emit()
+            self.close()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.selected_rect = QRect()  # Cancelar seleção
+            self.selection_finished.emit()
+            self.close()
+    
+    def closeEvent(self, event):
+        self.selection_finished.emit()
+        super().closeEvent(event)
+
+class ScrollCaptureBar(QWidget):
+    """Barra flutuante da captura com rolagem
+
+    Enquanto aberta, grava quadros da região a intervalos curtos; o usuário rola o
+    conteúdo normalmente e cada quadro novo é juntado ao anterior (ScrollStitcher).
+    """
+    finished = pyqtSignal()
+    interval = 250
+
+    def __init__(self, bbox, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        self.bbox = bbox
+        self.stitcher = ScrollStitcher()
+        self.accepted = False
+
+        self.status_label = QLabel("Role o conteúdo devagar; os quadros são juntados automaticamente.")
+        done_btn = QPushButton("✅ Concluir")
+        cancel_btn = QPushButton("❌ Cancelar")
+        done_btn.clicked.connect(self.finish)
+        cancel_btn.clicked.connect(self.close)
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(12, 8, 12, 8)
+        layout.addWidget(self.status_label)
+        layout.addWidget(done_btn)
+        layout.addWidget(cancel_btn)
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #263238;
+                font-family: 'Segoe UI', Arial;
+            }
+            QLabel {
+                color: white;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 6px 12px;
+                border-radius: 4px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+        self.place_outside_region()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.grab_frame)
+        self.grab_frame()
+        self.timer.start(self.interval)
+
+    def place_outside_region(self):
+        # A barra não pode aparecer dentro da região gravada
+        self.adjustSize()
+        screen = QDesktopWidget().screenGeometry()
+        left, top, right, bottom = self.bbox
+        x = max(screen.left(), min(left, screen.right() - self.width()))
+        y = bottom + 10
+        if y + self.height() > screen.bottom():
+            y = top - self.height() - 10
+        if y < screen.top():
+            y = screen.top() + 10
+        self.move(x, y)
+
+    def grab_frame(self):
+        from PIL import ImageGrab
+        with tracer.span("capture.scroll_frame"):
+            status = self.stitcher.add_frame(ImageGrab.grab(bbox=self.bbox))
+        if status == "no_overlap":
+            self.status_label.setText("⚠️ Sem sobreposição com o quadro anterior: role de volta um pouco.")
+        else:
+            self.status_label.setText(
+                f"{len(self.stitcher.parts)} quadro(s) · {self.stitcher.height} px de altura"
+            )
+        self.adjustSize()
+
+    def finish(self):
+        # Último quadro: o que foi rolado depois da última gravação
+        self.grab_frame()
+        self.accepted = True
+        self.close()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.close()
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.finished.emit()
+        super().closeEvent(event)
+
+class LRUCache:
+    """Cache LRU limitado pelo custo total dos itens (quantidade, bytes, ...)"""
+    def __init__(self, max_cost, cost=lambda value: 1):
+        self.max_cost = max_cost
+        self.cost = cost
+        self.total_cost = 0
+        self.items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self.items:
+            self.total_cost -= self.cost(self.items.pop(key))
+        self.items[key] = value
+        self.total_cost += self.cost(value)
+        # Descartar os menos usados recentemente (mantendo ao menos o novo item)
+        while self.total_cost > self.max_cost and len(self.items) > 1:
+            _, old_value = self.items.popitem(last=False)
+            self.total_cost -= self.cost(old_value)
+
+    def clear(self):
+        self.items.clear()
+        self.total_cost = 0
+
+class ImageTaskSignals(QObject):
+    # (chave da tarefa, imagem gerada; nula em caso de erro)
+    finished = pyqtSignal(object, QImage)
+
+def read_scaled_image(image_path, size):
+    """Lê a imagem redimensionada para caber em size (QImage nula em caso de erro)"""
+    reader = QImageReader(image_path)
+    original_size = reader.size()
+    if original_size.isValid() and (original_size.width() > size.width() or
+                                    original_size.height() > size.height()):
+        # Formatos como JPEG decodificam direto na escala reduzida
+        reader.setScaledSize(original_size.scaled(size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull():
+        image = image.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+class ScaledImageTask(QRunnable):
+    """Gera em segundo plano a versão reduzida de uma imagem.
+
+    key = (caminho, mtime_ns, tamanho do arquivo). Com cache_dir, o resultado
+    também é guardado em disco, identificado pelo hash e pela data de modificação.
+    """
+    def __init__(self, key, size, signals, cache_dir=None):
+        super().__init__()
+        self.key = key
+        self.size = size
+        self.signals = signals
+        self.cache_dir = cache_dir
+
+    def run(self):
+        image_path, mtime_ns, _ = self.key
+        image = QImage()
+        try:
+            disk_path = None
+            if self.cache_dir:
+                disk_path = os.path.join(self.cache_dir, f"{file_hash(image_path)}_{mtime_ns}.png")
+                if os.path.exists(disk_path):
+                    image = QImage(disk_path)
+
+            if image.isNull():
+                image = read_scaled_image(image_path, self.size)
+                if not image.isNull() and disk_path:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    fd, temp_path = tempfile.mkstemp(suffix=".png", dir=self.cache_dir)
+                    os.close(fd)
+                    if image.save(temp_path, "PNG"):
+                        os.replace(temp_path, disk_path)
+                    else:
+                        os.remove(temp_path)
+        except Exception:
+            image = QImage()
+        self.signals.finished.emit(self.key, image)
+
+class ImageLoadSignals(QObject):
+    # (função de carregamento, caminho extraído; vazio em caso de erro)
+    finished = pyqtSignal(object, str)
+
+class ImageLoadTask(QRunnable):
+    """Disponibiliza em disco, fora da thread principal, a imagem de uma etapa sob demanda"""
+    def __init__(self, loader, signals):
+        super().__init__()
+        self.loader = loader
+        self.signals = signals
+
+    def run(self):
+        try:
+            image_path = self.loader()
+        except Exception:
+            image_path = ""
+        self.signals.finished.emit(self.loader, image_path)
+
+class TemplateScanSignals(QObject):
+    # Lote de templates encontrados: [{"path", "title", "step_count", "first_image"}]
+    found = pyqtSignal(list)
+    finished = pyqtSignal()
+
+class TemplateScanTask(QRunnable):
+    """Percorre a pasta de templates em segundo plano, enviando os resultados em lotes"""
+    def __init__(self, directory, signals):
+        super().__init__()
+        self.directory = directory
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        batch = []
+        last_emit = time.monotonic()
+        try:
+            # scandir é iterado sem montar a lista inteira antes
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if self.cancelled:
+                        return
+                    if not entry.is_file() or not entry.name.endswith((".json", PROJECT_EXTENSION)):
+                        continue
+                    try:
+                        summary = read_template_summary(entry.path)
+                    except Exception:
+                        continue
+
+                    first_image = None
+                    if summary["steps"]:
+                        first = summary["steps"][0]
+                        first_image = first["image_path"]
+                        if first_image is None and first["image_hash"]:
+                            try:
+                                first_image = extract_project_blob(entry.path, first["image_hash"])
+                            except Exception:
+                                first_image = None
+                    batch.append({"path": entry.path,
+                                  "title": summary["title"] or os.path.splitext(entry.name)[0],
+                                  "step_count": len(summary["steps"]),
+                                  "first_image": first_image})
+
+                    # Lotes pequenos e frequentes: a lista cresce enquanto a varredura continua
+                    if len(batch) >= 50 or time.monotonic() - last_emit > 0.1:
+                        self.signals.found.emit(batch)
+                        batch = []
+                        last_emit = time.monotonic()
+        except OSError:
+            pass
+        finally:
+            if batch and not self.cancelled:
+                self.signals.found.emit(batch)
+            self.signals.finished.emit()
+
+WATCH_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+class IngestSignals(QObject):
+    # (arquivo de origem, imagem copiada para 'images', metadados)
+    ingested = pyqtSignal(str, str, object)
+    failed = pyqtSignal(str)
+
+class IngestImagesTask(QRunnable):
+    """Copia imagens externas para a pasta 'images' (convertendo para PNG) em segundo plano"""
+    def __init__(self, sources, signals):
+        super().__init__()
+        self.sources = sources
+        self.signals = signals
+
+    def run(self):
+        import shutil
+        from PIL import Image
+        def modified_at(source):
+            try:
+                return os.path.getmtime(source)
+            except OSError:
+                return 0
+        # Etapas na ordem em que as capturas foram gravadas, não na ordem dos nomes
+        for source in sorted(self.sources, key=modified_at):
+            try:
+                captured_at = os.path.getmtime(source)
+                image_path = new_image_path()
+                if source.lower().endswith(".png"):
+                    shutil.copy2(source, image_path)
+                else:
+                    # O PDF identifica o formato pela extensão: tudo é gravado como PNG
+                    with Image.open(source) as img:
+                        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                            img = img.convert("RGBA")
+                        atomic_save_image(img, image_path)
+                meta = ImageMeta.from_file(image_path, captured_at=captured_at)
+            except Exception:
+                self.signals.failed.emit(source)
+                continue
+            self.signals.ingested.emit(source, image_path, meta)
+
+class FolderWatcher(QObject):
+    """Detecta imagens novas em uma pasta monitorada
+
+    O QFileSystemWatcher avisa quando a pasta muda; só então os nomes são
+    listados e comparados com os já conhecidos, sem ler metadados dos demais
+    arquivos. Um arquivo novo é entregue quando seu tamanho para de mudar entre
+    duas verificações (a ferramenta de captura terminou de gravá-lo); essas
+    novas verificações consultam apenas os arquivos novos, sem listar a pasta.
+    """
+    files_ready = pyqtSignal(list)
+
+    def __init__(self, interval=500, parent=None):
+        super().__init__(parent)
+        self.directory = None
+        self.known = set()
+        # Arquivos novos ainda em gravação: nome -> último tamanho visto
+        self.candidates = {}
+        # A pasta mudou desde a última listagem
+        self.listing_changed = False
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_check)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.check)
+
+    def image_names(self):
+        with os.scandir(self.directory) as entries:
+            return {entry.name for entry in entries
+                    if entry.name.lower().endswith(WATCH_EXTENSIONS)}
+
+    def start(self, directory):
+        self.stop()
+        self.directory = directory
+        # Imagens que já estavam na pasta não são importadas
+        self.known = self.image_names()
+        self.watcher.addPath(directory)
+
+    def stop(self):
+        self.timer.stop()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.directory = None
+        self.known = set()
+        self.candidates = {}
+        self.listing_changed = False
+
+    def is_active(self):
+        return self.directory is not None
+
+    def schedule_check(self):
+        # Várias notificações seguidas geram uma única verificação
+        self.listing_changed = True
+        self.timer.start()
+
+    def check(self):
+        if self.directory is None:
+            return
+        if self.listing_changed:
+            self.listing_changed = False
+            try:
+                names = self.image_names()
+            except OSError:
+                return
+            self.known &= names
+            for name in names - self.known:
+                self.candidates.setdefault(name, -1)
+
+        ready = []
+        for name, last_size in list(self.candidates.items()):
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                del self.candidates[name]
+                continue
+            if size > 0 and size == last_size:
+                del self.candidates[name]
+                self.known.add(name)
+                ready.append(os.path.join(self.directory, name))
+            else:
+                self.candidates[name] = size
+
+        # Arquivos ainda em gravação são verificados de novo sem esperar outra notificação
+        if self.candidates:
+            self.timer.start()
+        if ready:
+            self.files_ready.emit(sorted(ready))
+
+class ThumbnailCache(QObject):
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, size=QSize(128, 96), max_items=1000, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.cache_dir = os.path.join(current_dir, 'images', '.thumbs')
+        self.memory = LRUCache(max_items)
+        self.pending = set()
+        self.failed = set()
+        self.signals = ImageTaskSignals()
+        self.signals.finished.connect(self._on_finished)
+        # Etapas de projeto cuja imagem está sendo extraída: função de carregamento -> etapa
+        self.loading = {}
+        self.load_signals = ImageLoadSignals()
+        self.load_signals.finished.connect(self._on_loaded)
+
+    def key_for(self, image_path):
+        try:
+            stat = os.stat(image_path)
+        except (OSError, TypeError):
+            return None
+        return (image_path, stat.st_mtime_ns, stat.st_size)
+
+    def get_for_step(self, step):
+        """Como get, mas a imagem de etapas sob demanda é extraída na tarefa em segundo plano"""
+        loader = step.image_loader
+        if loader is None:
+            return self.get(step.image_path)
+        if loader not in self.loading and loader not in self.failed:
+            self.loading[loader] = step
+            QThreadPool.globalInstance().start(ImageLoadTask(loader, self.load_signals))
+        return None
+
+    def _on_loaded(self, loader, image_path):
+        step = self.loading.pop(loader, None)
+        if not image_path:
+            self.failed.add(loader)
+            return
+        if step is not None:
+            step.finish_loading(loader, image_path)
+        # Agenda a miniatura; thumbnail_ready atualiza a linha quando ficar pronta
+        self.get(image_path)
+
+    def get(self, image_path):
+        """Retorna a miniatura se estiver em memória; senão agenda a geração e retorna None"""
+        key = self.key_for(image_path)
+        if key is None or key in self.failed:
+            return None
+        pixmap = self.memory.get(key)
+        if pixmap is None and key not in self.pending:
+            self.pending.add(key)
+            QThreadPool.globalInstance().start(
+                ScaledImageTask(key, self.size, self.signals, self.cache_dir)
+            )
+        return pixmap
+
+    def _on_finished(self, key, image):
+        self.pending.discard(key)
+        if image.isNull():
+            self.failed.add(key)
+            return
+        # QPixmap só pode ser criado na thread principal
+        self.memory.put(key, QPixmap.fromImage(image))
+        self.thumbnail_ready.emit(key[0])
+
+class PreviewCache(QObject):
+    """Imagens de pré-visualização já redimensionadas, limitadas pela memória ocupada"""
+    preview_ready = pyqtSignal(object)
+    # Chave cuja imagem não pôde ser lida
+    preview_failed = pyqtSignal(object)
+
+    def __init__(self, size=QSize(400, 300), max_bytes=64 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.memory = LRUCache(max_bytes, cost=lambda pixmap:
+                               pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8)
+        self.pending = set()
+        self.signals = ImageTaskSignals()
+        self.signals.finished.connect(self._on_finished)
+
+    def key_for(self, image_path):
+        try:
+            stat = os.stat(image_path)
+        except (OSError, TypeError):
+            return None
+        return (image_path, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key):
+        return self.memory.get(key)
+
+    def load_now(self, key):
+        """Carrega a imagem de forma síncrona (usado quando a etapa atual não está em cache)"""
+        image = read_scaled_image(key[0], self.size)
+        if image.isNull():
+            return None
+        pixmap = QPixmap.fromImage(image)
+        self.memory.put(key, pixmap)
+        return pixmap
+
+    def prefetch(self, image_path):
+        key = self.key_for(image_path)
+        if key is not None and key not in self.memory and key not in self.pending:
+            self.pending.add(key)
+            QThreadPool.globalInstance().start(ScaledImageTask(key, self.size, self.signals))
+
+    def _on_finished(self, key, image):
+        self.pending.discard(key)
+        if image.isNull():
+            self.preview_failed.emit(key)
+            return
+        self.memory.put(key, QPixmap.fromImage(image))
+        self.preview_ready.emit(key)
+
+STEP_ROWS_MIME = "application/x-doc-creator-step-rows"
+
+class StepListModel(QAbstractListModel):
+    """Modelo da lista de etapas: a view consulta apenas as linhas visíveis"""
+    def __init__(self, thumbnails, parent=None):
+        super().__init__(parent)
+        self.steps = []
+        self.thumbnails = thumbnails
+        # Mesmo tamanho de ícone para todas as linhas enquanto as miniaturas são geradas
+        placeholder = QPixmap(thumbnails.size)
+        placeholder.fill(Qt.transparent)
+        self.placeholder_icon = QIcon(placeholder)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.steps)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.steps):
+            return None
+        step = self.steps[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return step.name
+        if role == Qt.DecorationRole:
+            pixmap = self.thumbnails.get_for_step(step)
+            return QIcon(pixmap) if pixmap is not None else self.placeholder_icon
+        if role == Qt.ToolTipRole:
+            return step.description[:300] or None
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid():
+            return flags | Qt.ItemIsDragEnabled
+        return flags | Qt.ItemIsDropEnabled
+
+    # Alterações na lista
+
+    def reset_steps(self, steps):
+        self.beginResetModel()
+        self.steps = list(steps)
+        self.endResetModel()
+
+    def append_step(self, step):
+        row = len(self.steps)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.steps.append(step)
+        self.endInsertRows()
+        return row
+
+    def insert_step(self, row, step):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.steps.insert(row, step)
+        self.endInsertRows()
+        return row
+
+    def remove_step(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        step = self.steps.pop(row)
+        self.endRemoveRows()
+        return step
+
+    def step_changed(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def refresh_icons(self):
+        # A view só volta a consultar as linhas visíveis
+        if self.steps:
+            self.dataChanged.emit(self.index(0), self.index(len(self.steps) - 1),
+                                  [Qt.DecorationRole])
+
+    # Reordenação por arrastar e soltar
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [STEP_ROWS_MIME]
+
+    def mimeData(self, indexes):
+        mime_data = QMimeData()
+        rows = ",".join(str(index.row()) for index in indexes)
+        mime_data.setData(STEP_ROWS_MIME, QByteArray(rows.encode()))
+        return mime_data
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_row):
+        if source_parent.isValid() or destination_parent.isValid() or count <= 0:
+            return False
+        if source_row <= destination_row <= source_row + count:
+            return False
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1,
+                                  QModelIndex(), destination_row):
+            return False
+        moved = self.steps[source_row:source_row + count]
+        del self.steps[source_row:source_row + count]
+        if destination_row > source_row:
+            destination_row -= count
+        self.steps[destination_row:destination_row] = moved
+        self.endMoveRows()
+        return True
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(STEP_ROWS_MIME):
+            return False
+        rows = [int(value) for value in bytes(data.data(STEP_ROWS_MIME)).decode().split(",") if value]
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self.steps)
+        if len(rows) == 1:
+            self.moveRows(QModelIndex(), rows[0], 1, QModelIndex(), row)
+        # A movimentação já foi feita: False evita que a view remova as linhas de origem
+        return False
+
+class TemplateSearchDialog(QDialog):
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Buscar nos Templates")
+        self.setModal(True)
+        self.index = index
+        self.selected = None
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QLineEdit, QListWidget {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 6px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Digite palavras do título, nome ou descrição das etapas...")
+        self.query_edit.textChanged.connect(self.update_results)
+        layout.addWidget(self.query_edit)
+
+        self.results_list = QListWidget()
+        self.results_list.itemDoubleClicked.connect(self.open_result)
+        layout.addWidget(self.results_list)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        open_button = QPushButton("📂 Abrir")
+        open_button.clicked.connect(lambda: self.open_result(self.results_list.currentItem()))
+        cancel_button = QPushButton("❌ Cancelar")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(open_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+        # Templates alterados enquanto o diálogo está aberto são reindexados, assim
+        # como os que usam um fragmento atualizado
+        self.watcher = QFileSystemWatcher([index.directory], self)
+        if os.path.isdir(FRAGMENTS_DIR):
+            self.watcher.addPath(FRAGMENTS_DIR)
+        self.watcher.directoryChanged.connect(self.reindex)
+
+        self.index.refresh()
+        self.update_results()
+        self.resize(600, 500)
+
+    def reindex(self):
+        self.index.refresh()
+        self.update_results()
+
+    def update_results(self):
+        self.results_list.clear()
+        query = self.query_edit.text()
+        if not query.strip():
+            self.status_label.setText(f"{len(self.index.files)} templates indexados")
+            return
+
+        started = time.perf_counter()
+        results = self.index.search(query)
+        elapsed = (time.perf_counter() - started) * 1000
+        for path, row, label in results:
+            item = QListWidgetItem(f"{label}  ({os.path.basename(path)})")
+            item.setData(Qt.UserRole, (path, row))
+            self.results_list.addItem(item)
+        if results:
+            self.results_list.setCurrentRow(0)
+        self.status_label.setText(f"{len(results)} resultados em {elapsed:.1f} ms")
+
+    def open_result(self, item):
+        if item is not None:
+            self.selected = item.data(Qt.UserRole)
+            self.accept()
+
+class TemplateLibraryDialog(QDialog):
+    def __init__(self, thumbnails, directory=TEMPLATES_DIR, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Biblioteca de Templates")
+        self.setModal(True)
+        self.thumbnails = thumbnails
+        self.selected = None
+        # Itens aguardando a miniatura da primeira etapa, por caminho da imagem
+        self.waiting_items = {}
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QListWidget {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 4px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        # Grade de miniaturas com título e número de etapas
+        self.grid = QListWidget()
+        self.grid.setViewMode(QListWidget.IconMode)
+        self.grid.setIconSize(thumbnails.size)
+        self.grid.setGridSize(QSize(thumbnails.size.width() + 40, thumbnails.size.height() + 60))
+        self.grid.setResizeMode(QListWidget.Adjust)
+        self.grid.setMovement(QListWidget.Static)
+        self.grid.setUniformItemSizes(True)
+        self.grid.setWordWrap(True)
+        self.grid.itemDoubleClicked.connect(self.open_item)
+        layout.addWidget(self.grid)
+
+        self.status_label = QLabel("Procurando templates...")
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        open_button = QPushButton("📂 Abrir")
+        open_button.clicked.connect(lambda: self.open_item(self.grid.currentItem()))
+        cancel_button = QPushButton("❌ Cancelar")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(open_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+        placeholder = QPixmap(thumbnails.size)
+        placeholder.fill(Qt.transparent)
+        self.placeholder_icon = QIcon(placeholder)
+        self.thumbnails.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+        # Varredura em segundo plano: o diálogo abre imediatamente
+        self.scan_signals = TemplateScanSignals()
+        self.scan_signals.found.connect(self.add_templates)
+        self.scan_signals.finished.connect(self.scan_finished)
+        self.scan_task = TemplateScanTask(directory, self.scan_signals)
+        QThreadPool.globalInstance().start(self.scan_task)
+
+        self.resize(700, 550)
+
+    def add_templates(self, batch):
+        self.grid.setUpdatesEnabled(False)
+        for template in batch:
+            item = QListWidgetItem(f"{template['title']}\n{template['step_count']} etapas")
+            item.setData(Qt.UserRole, template["path"])
+            item.setToolTip(template["path"])
+            image_path = template["first_image"]
+            pixmap = self.thumbnails.get(image_path) if image_path else None
+            if pixmap is not None:
+                item.setIcon(QIcon(pixmap))
+            else:
+                item.setIcon(self.placeholder_icon)
+                if image_path:
+                    self.waiting_items.setdefault(image_path, []).append(item)
+            self.grid.addItem(item)
+        self.grid.setUpdatesEnabled(True)
+        self.status_label.setText(f"Procurando templates... {self.grid.count()} encontrados")
+
+    def on_thumbnail_ready(self, image_path):
+        items = self.waiting_items.pop(image_path, None)
+        if items:
+            pixmap = self.thumbnails.get(image_path)
+            if pixmap is not None:
+                for item in items:
+                    item.setIcon(QIcon(pixmap))
+
+    def scan_finished(self):
+        self.status_label.setText(f"{self.grid.count()} templates")
+
+    def open_item(self, item):
+        if item is not None:
+            self.selected = item.data(Qt.UserRole)
+            self.accept()
+
+    def done(self, result):
+        # Interrompe a varredura e deixa de receber miniaturas ao fechar
+        self.scan_task.cancelled = True
+        try:
+            self.scan_signals.found.disconnect(self.add_templates)
+            self.thumbnails.thumbnail_ready.disconnect(self.on_thumbnail_ready)
+        except TypeError:
+            pass
+        super().done(result)
+
+class MetricsDialog(QDialog):
+    COLUMNS = ("Trecho", "Amostras", "p50 (ms)", "p90 (ms)", "p99 (ms)", "Máx. (ms)", "Memória (KB)")
+
+    def __init__(self, tracer, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Desempenho")
+        self.tracer = tracer
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #f5f5f5;
+                font-family: 'Segoe UI', Arial;
+            }
+            QTableWidget {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        self.enabled_check = QCheckBox("Ativar medição (registro em images/.metrics.jsonl)")
+        self.enabled_check.setChecked(tracer.enabled)
+        self.enabled_check.toggled.connect(tracer.enable)
+        layout.addWidget(self.enabled_check)
+
+        # tracemalloc deixa o programa mais lento: só quando pedido
+        self.memory_check = QCheckBox("Medir também a memória (deixa o programa mais lento)")
+        self.memory_check.setChecked(tracer.track_memory)
+        self.memory_check.setEnabled(tracer.enabled)
+        self.memory_check.toggled.connect(tracer.track_memories)
+        self.enabled_check.toggled.connect(self.on_enabled_toggled)
+        layout.addWidget(self.memory_check)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        clear_button = QPushButton("🧹 Limpar")
+        clear_button.clicked.connect(self.clear)
+        close_button = QPushButton("Fechar")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(clear_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        # Atualiza enquanto o painel estiver aberto
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(1000)
+        self.refresh()
+        self.resize(700, 400)
+
+    def refresh(self):
+        rows = self.tracer.summary()
+        self.table.setRowCount(len(rows))
+        for row, (name, count, p50, p90, p99, maximum, memory) in enumerate(rows):
+            values = [name, str(count)] + [f"{value:.1f}" for value in (p50, p90, p99, maximum)]
+            values.append(f"{memory:.1f}" if memory is not None else "-")
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def on_enabled_toggled(self, enabled):
+        # Desligar a medição também desliga a da memória
+        self.memory_check.setEnabled(enabled)
+        if not enabled:
+            self.memory_check.setChecked(False)
+
+    def clear(self):
+        self.tracer.samples.clear()
+        self.refresh()
+
+class ExportDialog(QDialog):
+    """Escolha dos formatos de exportação e da pasta de destino"""
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        
-        # Configurar para tela cheia
-        desktop = QDesktopWidget()
-        screen_rect = desktop.screenGeometry()
-        self.setGeometry(screen_rect)
-        
-        # Capturar screenshot
-        self.screenshot = ImageGrab.grab()
-        self.pixmap = pil_to_qpixmap(self.screenshot)
-        
-        # Variáveis para seleção
-        self.start_point = QPoint()
-        self.end_point = QPoint()
-        self.selecting = False
-        self.selected_rect = QRect()
-        
-        # Configurar cursor
-        self.setCursor(Qt.CrossCursor)
-        
-        # Mostrar instruções
-        self.show_instructions = True
-        
-        # Configurar estilo
+        self.setWindowTitle("Exportar Documento")
+        self.setModal(True)
+
         self.setStyleSheet("""
-            QWidget {
+            QDialog {
+                background-color: #f5f5f5;
                 font-family: 'Segoe UI', Arial;
             }
+            QLineEdit {
+                background-color: white;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 6px;
+            }
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+                min-width: 80px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
         """)
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        
-        # Desenhar o screenshot
-        painter.drawPixmap(self.rect(), self.pixmap)
-        
-        # Desenhar overlay escuro com efeito de gradiente
-        overlay_color = QColor(0, 0, 0, 100)  # Preto com transparência
-        painter.fillRect(self.rect(), overlay_color)
-        
-        # Se estamos selecionando, desenhar retângulo
-        if self.selecting and not self.start_point.isNull() and not self.end_point.isNull():
-            selection_rect = QRect(self.start_point, self.end_point).normalized()
-            
-            # Desenhar área selecionada sem overlay
-            painter.drawPixmap(selection_rect, self.pixmap, selection_rect)
-            
-            # Desenhar borda da seleção com efeito de brilho
-            pen = QPen(QColor(33, 150, 243), 2, Qt.SolidLine)  # Azul Material Design
-            painter.setPen(pen)
-            painter.drawRect(selection_rect)
-            
-            # Desenhar dimensões
-            dimensions = f"{selection_rect.width()} x {selection_rect.height()}"
-            font = QFont("Segoe UI", 10)
-            painter.setFont(font)
-            painter.setPen(QPen(QColor(255, 255, 255)))
-            
-            # Desenhar fundo para o texto
-            text_rect = painter.fontMetrics().boundingRect(dimensions)
-            text_rect.moveTop(selection_rect.top() - text_rect.height() - 5)
-            text_rect.moveLeft(selection_rect.left())
-            painter.fillRect(text_rect, QColor(33, 150, 243, 200))
-            
-            # Desenhar texto
-            painter.drawText(text_rect, Qt.AlignCenter, dimensions)
-        
-        # Desenhar instruções com estilo moderno
-        if self.show_instructions:
-            painter.setPen(QPen(QColor(255, 255, 255)))
-            painter.setFont(QFont("Segoe UI", 14, QFont.Bold))
-            
-            # Desenhar fundo para as instruções
-            instruction_text = "Clique e arraste para selecionar uma área da tela. Pressione ESC para cancelar."
-            text_rect = painter.fontMetrics().boundingRect(instruction_text)
-            text_rect.moveTop(20)
-            text_rect.moveLeft(20)
-            text_rect.adjust(-10, -5, 10, 5)  # Adicionar padding
-            
-            # Desenhar fundo com efeito de vidro
-            painter.fillRect(text_rect, QColor(0, 0, 0, 150))
-            painter.drawRect(text_rect)
-            
-            # Desenhar texto
-            painter.drawText(30, 40, instruction_text)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.start_point = event.pos()
-            self.end_point = event.pos()
-            self.selecting = True
-            self.show_instructions = False
-            self.update()
+        layout.addWidget(QLabel("Formatos (gerados juntos, lendo cada imagem uma única vez):"))
+        self.pdf_check = QCheckBox("📄 PDF (documento.pdf)")
+        self.site_check = QCheckBox("🌐 Site HTML e Markdown (index.html, documento.md)")
+        self.zip_check = QCheckBox("🗜️ Imagens em ZIP (imagens.zip)")
+        self.pdf_check.setChecked(True)
+        for check in (self.pdf_check, self.site_check, self.zip_check):
+            layout.addWidget(check)
 
-    def mouseMoveEvent(self, event):
-        if self.selecting:
-            self.end_point = event.pos()
-            self.update()
+        # Opção do PDF: linearizado, com objetos em fluxos comprimidos (requer pikepdf)
+        self.web_pdf_check = QCheckBox("PDF otimizado para web (primeira página aparece antes)")
+        self.web_pdf_check.setStyleSheet("margin-left: 20px;")
+        if web_pdf_available():
+            self.pdf_check.toggled.connect(self.web_pdf_check.setEnabled)
+        else:
+            self.web_pdf_check.setEnabled(False)
+            self.web_pdf_check.setToolTip("Requer o pacote 'pikepdf' (pip install pikepdf)")
+        layout.addWidget(self.web_pdf_check)
+        self.compact_pdf_check = QCheckBox("Layout compacto (várias etapas por página)")
+        self.compact_pdf_check.setStyleSheet("margin-left: 20px;")
+        self.pdf_check.toggled.connect(self.compact_pdf_check.setEnabled)
+        layout.addWidget(self.compact_pdf_check)
 
-    def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton and self.selecting:
-            self.end_point = event.pos()
-            self.selected_rect = QRect(self.start_point, self.end_point).normalized()
-            self.selecting = False
-            self.selection_finished.emit()
-            self.close()
+        layout.addWidget(QLabel("Pasta de destino:"))
+        folder_layout = QHBoxLayout()
+        self.folder_edit = QLineEdit()
+        browse_button = QPushButton("📂")
+        browse_button.clicked.connect(self.choose_folder)
+        folder_layout.addWidget(self.folder_edit)
+        folder_layout.addWidget(browse_button)
+        layout.addLayout(folder_layout)
 
-    def keyPressEvent(self, event):
-        if event.key() == Qt.Key_Escape:
-            self.selected_rect = QRect()  # Cancelar seleção
-            self.selection_finished.emit()
-            self.close()
-    
-    def closeEvent(self, event):
-        self.selection_finished.emit()
-        super().closeEvent(event)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.validate)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.resize(450, 250)
+
+    def choose_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Pasta de Destino")
+        if directory:
+            self.folder_edit.setText(directory)
+
+    def formats(self):
+        return {name for name, check in (("pdf", self.pdf_check), ("site", self.site_check),
+                                         ("zip", self.zip_check)) if check.isChecked()}
+
+    def output_dir(self):
+        return self.folder_edit.text().strip()
+
+    def web_pdf(self):
+        return self.pdf_check.isChecked() and self.web_pdf_check.isEnabled() and self.web_pdf_check.isChecked()
+
+    def pdf_layout(self):
+        return "compact" if self.compact_pdf_check.isChecked() else "page"
+
+    def validate(self):
+        if not self.formats():
+            QMessageBox.warning(self, "Aviso", "Selecione pelo menos um formato.")
+        elif not self.output_dir():
+            QMessageBox.warning(self, "Aviso", "Escolha a pasta de destino.")
+        else:
+            self.accept()
 
 class DocCreator(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Gerador de Documentação")
-        self.steps = []
         self.doc_title = "Documentação de Processo"
         self.doc_description = ""
+        # Último template salvo/carregado e arquivos de imagem que ele referencia
+        self.template_path = None
+        self.template_files = set()
+
+        # Miniaturas da lista de etapas, geradas em segundo plano
+        self.thumbnails = ThumbnailCache(parent=self)
+        self.thumbnails.thumbnail_ready.connect(self.schedule_icon_update)
+
+        # Modelo com as etapas do documento
+        self.step_model = StepListModel(self.thumbnails, self)
+        self.icon_timer = QTimer(self)
+        self.icon_timer.setSingleShot(True)
+        self.icon_timer.timeout.connect(self.step_model.refresh_icons)
+
+        # Pré-visualizações redimensionadas, com as etapas vizinhas carregadas antes
+        self.previews = PreviewCache(parent=self)
+        self.previews.preview_ready.connect(self.on_preview_ready)
+        self.previews.preview_failed.connect(self.on_preview_failed)
+        self.waiting_preview = None
+
+        # Último layout escolhido para o PDF
+        self.pdf_layout_choice = "Uma etapa por página"
+
+        # Índice de busca da biblioteca de templates (atualizado a cada busca)
+        self.search_index = TemplateSearchIndex()
+
+        # Pasta monitorada: capturas feitas por outras ferramentas viram etapas
+        self.folder_watcher = FolderWatcher(parent=self)
+        self.folder_watcher.files_ready.connect(self.ingest_images)
+        self.ingest_signals = IngestSignals()
+        self.ingest_signals.ingested.connect(self.on_image_ingested)
+        self.ingest_signals.failed.connect(self.on_ingest_failed)
+        # Uma importação por vez: as etapas entram na ordem de chegada
+        self.ingest_pool = QThreadPool(self)
+        self.ingest_pool.setMaxThreadCount(1)
+
+        # Diário de alterações para recuperação após falhas. Edições de descrição
+        # ficam pendentes e são gravadas juntas após uma pausa na digitação
+        self.journal = AutosaveJournal()
+        self.pending_descriptions = set()
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.timeout.connect(self.flush_journal)
+        self.compact_timer = QTimer(self)
+        self.compact_timer.timeout.connect(self.compact_journal_if_needed)
+        self.compact_timer.start(2 * 60 * 1000)
+        self.step_model.rowsAboutToBeMoved.connect(self.flush_journal)
+        self.step_model.rowsMoved.connect(self.journal_move)
         
         # Configurar estilo moderno
         self.setStyleSheet("""
@@ -714,6 +4127,10 @@ class DocCreator(QWidget):
         
         self.init_ui()
 
+        # Diário deixado por uma execução interrompida: oferecer a recuperação
+        if self.journal.exists():
+            QTimer.singleShot(0, self.offer_recovery)
+
     def init_ui(self):
         main_layout = QVBoxLayout(self)
         main_layout.setSpacing(15)
@@ -726,35 +4143,72 @@ class DocCreator(QWidget):
         # Estilo específico para cada botão
         button_styles = {
             "add": "background-color: #4CAF50;",
+            "scroll": "background-color: #43A047;",
             "edit": "background-color: #2196F3;",
             "delete": "background-color: #F44336;",
             "pdf": "background-color: #9C27B0;",
+            "export": "background-color: #0288D1;",
             "save_template": "background-color: #FF9800;",
             "load_template": "background-color: #795548;",
             "rename": "background-color: #607D8B;",
-            "edit_cover": "background-color: #673AB7;"
+            "edit_cover": "background-color: #673AB7;",
+            "batch": "background-color: #009688;",
+            "highlight": "background-color: #F57C00;",
+            "fragments": "background-color: #7B1FA2;",
+            "search": "background-color: #3F51B5;",
+            "library": "background-color: #5D4037;",
+            "watch": "background-color: #00796B;",
+            "metrics": "background-color: #455A64;"
         }
         
         # Criar botões com tamanho mínimo
         self.add_btn = QPushButton("➕ Adicionar")
+        scroll_btn = QPushButton("📜 Rolagem")
+        scroll_btn.setToolTip("Captura uma região enquanto você rola o conteúdo e junta tudo em uma imagem")
         self.edit_btn = QPushButton("✏️ Editar")
         self.delete_btn = QPushButton("🗑️ Deletar")
         self.pdf_btn = QPushButton("📄 PDF")
+        export_btn = QPushButton("📦 Exportar")
         save_template_btn = QPushButton("💾 Salvar")
         load_template_btn = QPushButton("📂 Carregar")
         self.rename_btn = QPushButton("✏️ Renomear")
         edit_cover_btn = QPushButton("📑 Capa")
+        batch_btn = QPushButton("🧰 Lote")
+        highlight_btn = QPushButton("✨ Destacar")
+        highlight_btn.setToolTip("Propõe retângulos em volta do que mudou em relação à etapa anterior")
+        fragments_btn = QPushButton("🧩 Fragmentos")
+        fragments_menu = QMenu(fragments_btn)
+        fragments_menu.addAction("Inserir fragmento...", self.insert_fragment)
+        fragments_menu.addAction("Salvar etapas como fragmento...", self.save_steps_as_fragment)
+        fragments_btn.setMenu(fragments_menu)
+        search_btn = QPushButton("🔍 Buscar")
+        library_btn = QPushButton("📚 Biblioteca")
+        self.watch_btn = QPushButton("👁️ Monitorar")
+        self.watch_btn.setCheckable(True)
+        # Avisos da pasta monitorada (imagens que não puderam ser importadas)
+        self.watch_status = QLabel()
+        self.watch_status.setStyleSheet("color: #E65100;")
+        metrics_btn = QPushButton("📊 Desempenho")
         
         # Aplicar estilos específicos e tamanho mínimo
         for btn, style in [
             (self.add_btn, button_styles["add"]),
+            (scroll_btn, button_styles["scroll"]),
             (self.edit_btn, button_styles["edit"]),
             (self.delete_btn, button_styles["delete"]),
             (self.pdf_btn, button_styles["pdf"]),
+            (export_btn, button_styles["export"]),
             (save_template_btn, button_styles["save_template"]),
             (load_template_btn, button_styles["load_template"]),
             (self.rename_btn, button_styles["rename"]),
-            (edit_cover_btn, button_styles["edit_cover"])
+            (edit_cover_btn, button_styles["edit_cover"]),
+            (batch_btn, button_styles["batch"]),
+            (highlight_btn, button_styles["highlight"]),
+            (fragments_btn, button_styles["fragments"]),
+            (search_btn, button_styles["search"]),
+            (library_btn, button_styles["library"]),
+            (self.watch_btn, button_styles["watch"]),
+            (metrics_btn, button_styles["metrics"])
         ]:
             btn.setMinimumWidth(100)  # Definir largura mínima
             btn.setStyleSheet(f"""
@@ -777,53 +4231,82 @@ class DocCreator(QWidget):
         
         # Conectar sinais
         self.add_btn.clicked.connect(self.add_step)
+        scroll_btn.clicked.connect(self.add_scroll_step)
         self.edit_btn.clicked.connect(self.edit_image)
         self.delete_btn.clicked.connect(self.delete_step)
         self.pdf_btn.clicked.connect(self.generate_pdf)
+        export_btn.clicked.connect(self.export_document)
         save_template_btn.clicked.connect(self.save_template)
         load_template_btn.clicked.connect(self.load_template)
         self.rename_btn.clicked.connect(self.edit_step_name)
         edit_cover_btn.clicked.connect(self.edit_cover)
+        batch_btn.clicked.connect(self.batch_operations)
+        highlight_btn.clicked.connect(self.highlight_changes)
+        search_btn.clicked.connect(self.search_templates)
+        library_btn.clicked.connect(self.open_library)
+        self.watch_btn.toggled.connect(self.toggle_watch_folder)
+        metrics_btn.clicked.connect(self.show_metrics)
         
         # Adicionar botões ao layout com quebra de linha
         first_row = QHBoxLayout()
         second_row = QHBoxLayout()
+        third_row = QHBoxLayout()
         
         # Primeira linha de botões
-        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.rename_btn]:
+        for btn in [self.add_btn, scroll_btn, self.edit_btn, self.delete_btn, self.rename_btn]:
             first_row.addWidget(btn)
         
         # Segunda linha de botões
-        for btn in [self.pdf_btn, save_template_btn, load_template_btn, edit_cover_btn]:
+        for btn in [self.pdf_btn, export_btn, save_template_btn, load_template_btn, edit_cover_btn]:
             second_row.addWidget(btn)
+
+        # Terceira linha: ferramentas
+        for btn in [batch_btn, highlight_btn, fragments_btn, search_btn, library_btn,
+                    self.watch_btn, metrics_btn]:
+            third_row.addWidget(btn)
+        third_row.addStretch()
+        third_row.addWidget(self.watch_status)
         
-        # Adicionar as duas linhas ao layout principal
+        # Adicionar as linhas ao layout principal
         main_layout.addLayout(first_row)
         main_layout.addLayout(second_row)
+        main_layout.addLayout(third_row)
         
         # Lista de etapas com estilo moderno
         steps_label = QLabel("📋 Etapas:")
         steps_label.setStyleSheet("font-size: 14px; margin-top: 10px;")
         
-        self.step_list = QListWidget()
+        self.step_list = QListView()
+        self.step_list.setModel(self.step_model)
         self.step_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: white;
                 border: 1px solid #E0E0E0;
                 border-radius: 4px;
                 padding: 4px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 8px;
                 border-bottom: 1px solid #E0E0E0;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #E3F2FD;
                 color: #1976D2;
             }
         """)
-        self.step_list.itemClicked.connect(self.display_step)
-        self.step_list.setMaximumHeight(150)
+        # Todas as linhas têm a mesma altura: a view não mede item por item
+        self.step_list.setUniformItemSizes(True)
+        self.step_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.step_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # Reordenar arrastando
+        self.step_list.setDragDropMode(QAbstractItemView.InternalMove)
+        self.step_list.setDefaultDropAction(Qt.MoveAction)
+        # Exibir a etapa também ao navegar com as setas do teclado
+        self.step_list.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self.display_step(current.row())
+        )
+        self.step_list.setMaximumHeight(200)
+        self.step_list.setIconSize(QSize(64, 48))
         
         # Visualização da imagem com estilo moderno
         image_label = QLabel("🖼️ Imagem:")
@@ -857,6 +4340,25 @@ class DocCreator(QWidget):
                 padding: 8px;
             }
         """)
+        self.desc_edit.setToolTip("Formatação: **negrito**, *itálico*, `código` e listas (- item ou 1. item)")
+
+        # Pré-visualização da descrição formatada, como sai no PDF e no site
+        self.desc_preview = QLabel()
+        self.desc_preview.setTextFormat(Qt.RichText)
+        self.desc_preview.setWordWrap(True)
+        self.desc_preview.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.desc_preview.setMaximumHeight(100)
+        self.desc_preview.setStyleSheet("""
+            QLabel {
+                background-color: #FAFAFA;
+                border: 1px solid #E0E0E0;
+                border-radius: 4px;
+                padding: 8px;
+            }
+        """)
+        desc_layout = QHBoxLayout()
+        desc_layout.addWidget(self.desc_edit)
+        desc_layout.addWidget(self.desc_preview)
         
         # Adicionar widgets ao layout principal
         main_layout.addWidget(steps_label)
@@ -864,7 +4366,7 @@ class DocCreator(QWidget):
         main_layout.addWidget(image_label)
         main_layout.addWidget(self.image_label)
         main_layout.addWidget(desc_label)
-        main_layout.addWidget(self.desc_edit)
+        main_layout.addLayout(desc_layout)
         
         # Configurar tamanho mínimo da janela
         self.setMinimumSize(800, 700)
@@ -895,35 +4397,9 @@ class DocCreator(QWidget):
                            rect.x() + rect.width(), 
                            rect.y() + rect.height())
                 
-                step_img = selector.screenshot.crop(crop_box)
-                
-                # Criar pasta 'images' se não existir
-                images_dir = os.path.join(os.path.dirname(__file__), 'images')
-                os.makedirs(images_dir, exist_ok=True)
-                
-                # Salvar imagem na pasta 'images'
-                img_path = os.path.join(images_dir, f"step_{len(self.steps) + 1}.png")
-                step_img.save(img_path)
-                
-                # Criar nova etapa com nome personalizável
-                text, ok = QInputDialog.getText(
-                    self, 
-                    "Nome da Etapa", 
-                    "Digite o nome da etapa:",
-                    QLineEdit.Normal,
-                    f"Etapa {len(self.steps) + 1}"
-                )
-                if not ok:
-                    text = f"Etapa {len(self.steps) + 1}"
-                
-                step = Step(img_path, "")
-                self.steps.append(step)
-                
-                item = QListWidgetItem(text)
-                self.step_list.addItem(item)
-                self.step_list.setCurrentItem(item)
-                
-                self.display_step(item)
+                with tracer.span("capture.crop"):
+                    step_img = selector.screenshot.crop(crop_box)
+                self.add_captured_image(step_img)
     
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao capturar tela: {str(e)}")
@@ -933,41 +4409,308 @@ class DocCreator(QWidget):
             self.raise_()
             self.activateWindow()
 
+    def add_scroll_step(self):
+        # Mesma preparação da captura comum: a janela principal sai da frente
+        self.showMinimized()
+        QTimer.singleShot(500, self.capture_scrolling)
+
+    def capture_scrolling(self):
+        try:
+            selector = RegionSelector()
+            loop = QEventLoop()
+            selector.selection_finished.connect(loop.quit)
+            selector.show()
+            loop.exec_()
+
+            rect = selector.selected_rect
+            if rect.isEmpty():
+                return
+            bar = ScrollCaptureBar((rect.x(), rect.y(), rect.x() + rect.width(), rect.y() + rect.height()))
+            loop = QEventLoop()
+            bar.finished.connect(loop.quit)
+            bar.show()
+            loop.exec_()
+
+            if bar.accepted and bar.stitcher.parts:
+                with tracer.span("capture.stitch"):
+                    step_img = bar.stitcher.image()
+                self.add_captured_image(step_img)
+
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro na captura com rolagem: {str(e)}")
+
+        finally:
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+
+    def add_captured_image(self, step_img):
+        """Salva a captura em 'images' e cria a etapa, pedindo o nome ao usuário"""
+        # Salvar imagem na pasta 'images' com nome único
+        img_path = new_image_path()
+        with tracer.span("capture.save"):
+            step_img.save(img_path)
+        
+        # Criar nova etapa com nome personalizável
+        text, ok = QInputDialog.getText(
+            self, 
+            "Nome da Etapa", 
+            "Digite o nome da etapa:",
+            QLineEdit.Normal,
+            f"Etapa {len(self.steps) + 1}"
+        )
+        if not ok:
+            text = f"Etapa {len(self.steps) + 1}"
+        
+        step = Step(img_path, "", name=text)
+        step.meta = ImageMeta.from_file(img_path, captured_at=time.time())
+        row = self.step_model.append_step(step)
+        self.journal_record("add", row=row, step=self.journal_entry(step))
+        self.select_row(row)
+
+    @property
+    def steps(self):
+        return self.step_model.steps
+
+    def current_row(self):
+        return self.step_list.currentIndex().row()
+
+    def select_row(self, row):
+        index = self.step_model.index(row)
+        if self.current_row() == row:
+            self.display_step(row)
+        else:
+            # A etapa é exibida pelo sinal currentRowChanged
+            self.step_list.setCurrentIndex(index)
+        self.step_list.scrollTo(index)
+
     def edit_image(self):
-        current_item = self.step_list.currentItem()
-        if current_item:
-            row = self.step_list.row(current_item)
+        row = self.current_row()
+        if row >= 0:
             if row < len(self.steps):
                 step = self.steps[row]
                 if os.path.exists(step.image_path):
-                    editor = ImageEditor(step.image_path, self)
+                    step_choices = [(i, other.name)
+                                    for i, other in enumerate(self.steps) if i != row]
+                    output_path = self.writable_image_path(step)
+                    editor = ImageEditor(step.image_path, self, step_choices, output_path)
                     if editor.exec_() == QDialog.Accepted:
+                        self.set_step_image(step, output_path)
+                        if editor.batch_redaction:
+                            self.apply_batch_redaction(*editor.batch_redaction)
                         # Atualizar visualização
-                        self.display_step(current_item)
+                        self.display_step(row)
                         QMessageBox.information(self, "Sucesso", "Imagem editada com sucesso!")
                 else:
                     QMessageBox.warning(self, "Erro", "Arquivo de imagem não encontrado!")
         else:
             QMessageBox.warning(self, "Aviso", "Selecione uma etapa para editar!")
 
+    def writable_image_path(self, step):
+        # Imagens compartilhadas nunca são alteradas: a edição vai para uma cópia
+        return step.image_path if step.owns_image else new_image_path()
+
+    def set_step_image(self, step, image_path, meta=None):
+        captured_at = step.meta.captured_at if step.meta else None
+        step.image_path = image_path
+        step.owns_image = True
+
+        # Metadados da nova versão (mantendo a data da captura original)
+        if meta is None:
+            meta = ImageMeta.from_file(image_path, captured_at)
+        else:
+            meta.captured_at = captured_at or meta.captured_at
+            _hash_cache[image_path] = (meta.mtime_ns, meta.byte_size, meta.content_hash)
+        step.meta = meta
+        if step in self.steps:
+            self.journal_record("image", row=self.steps.index(step), image_path=image_path)
+
+        # A miniatura antiga deixa de valer (a nova chave inclui mtime e tamanho)
+        self.schedule_icon_update()
+
+    def schedule_icon_update(self):
+        # Agrupa várias atualizações (miniaturas prontas, imagens alteradas) em uma só
+        self.icon_timer.start(0)
+
+    def apply_batch_redaction(self, mode, box, strength, indices):
+        errors = []
+        for row in indices:
+            if row < len(self.steps):
+                step = self.steps[row]
+                try:
+                    output_path = self.writable_image_path(step)
+                    redact_image_file(step.image_path, box, mode, strength, output_path)
+                    self.set_step_image(step, output_path)
+                except Exception as e:
+                    errors.append(f"{step.name}: {str(e)}")
+        if errors:
+            QMessageBox.warning(self, "Aviso",
+                                "Não foi possível ocultar algumas etapas:\n" + "\n".join(errors))
+
+    def batch_operations(self):
+        if not self.steps:
+            QMessageBox.warning(self, "Aviso", "Nenhuma etapa para processar.")
+            return
+
+        row = self.current_row()
+        preview_step = self.steps[row] if 0 <= row < len(self.steps) else self.steps[0]
+        dialog = BatchOperationsDialog(preview_step.image_path, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        operations = dialog.operations()
+        if not operations:
+            QMessageBox.warning(self, "Aviso", "Nenhuma operação selecionada.")
+            return
+        self.run_batch_operations(operations, dialog.dry_run_check.isChecked())
+
+    def run_batch_operations(self, operations, dry_run, step_operations=None):
+        """Aplica as operações em todas as etapas ou, com step_operations ({etapa:
+        operações}), apenas nas etapas indicadas, cada uma com as suas"""
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        steps = list(step_operations) if step_operations else self.steps
+        targets = [(step, step.name) for step in steps if os.path.exists(step.image_path)]
+
+        progress = QProgressDialog("Processando imagens...", "Cancelar", 0, len(targets), self)
+        progress.setWindowTitle("Operações em Lote")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        # Uma tarefa por imagem, distribuídas entre os núcleos disponíveis
+        pool = get_worker_pool()
+        jobs = {}
+        for step, name in targets:
+            output_path = None if dry_run else self.writable_image_path(step)
+            step_ops = step_operations[step] if step_operations else operations
+            future = pool.submit(process_image_job, step.image_path, step_ops, dry_run, output_path)
+            jobs[future] = (step, name)
+
+        results, errors = [], []
+
+        def collect(futures):
+            for future in futures:
+                step, name = jobs[future]
+                try:
+                    output_path, before, after, meta = future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {str(e)}")
+                    continue
+                results.append((name, before, after))
+                if not dry_run:
+                    self.set_step_image(step, output_path, ImageMeta.from_dict(meta))
+
+        pending = set(jobs)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                collect(done)
+                progress.setValue(len(results) + len(errors))
+                QApplication.processEvents()
+
+                if progress.wasCanceled():
+                    # Tarefas já em execução terminam (a escrita é atômica)
+                    pending = {future for future in pending if not future.cancel()}
+                    collect(wait(pending).done)
+                    break
+        finally:
+            progress.close()
+
+        if dry_run:
+            lines = [f"{name}: {before[0]}x{before[1]} → {after[0]}x{after[1]}"
+                     for name, before, after in results]
+            summary = "Simulação (nenhum arquivo alterado):\n" + "\n".join(lines[:20])
+            if len(lines) > 20:
+                summary += f"\n... e mais {len(lines) - 20} etapa(s)"
+        else:
+            summary = f"{len(results)} imagem(ns) processada(s)."
+            if self.current_row() >= 0:
+                self.display_step(self.current_row())
+
+        if errors:
+            summary += "\n\nErros:\n" + "\n".join(errors[:10])
+        QMessageBox.information(self, "Operações em Lote", summary)
+
+    def highlight_changes(self):
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        pairs = [(previous, step, number) for number, (previous, step)
+                 in enumerate(zip(self.steps, self.steps[1:]), 2)
+                 if os.path.exists(previous.image_path) and os.path.exists(step.image_path)]
+        if not pairs:
+            QMessageBox.warning(self, "Aviso", "São necessárias ao menos duas etapas com imagem.")
+            return
+
+        progress = QProgressDialog("Comparando etapas...", "Cancelar", 0, len(pairs), self)
+        progress.setWindowTitle("Destacar Mudanças")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        # Cada par (etapa anterior, etapa) é comparado em um processo de trabalho
+        pool = get_worker_pool()
+        jobs = {pool.submit(detect_changes_job, previous.image_path, step.image_path): (step, number)
+                for previous, step, number in pairs}
+        found, skipped, errors = {}, 0, []
+        pending = set(jobs)
+        try:
+            with tracer.span("highlight.detect"):
+                while pending:
+                    done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        step, number = jobs[future]
+                        try:
+                            boxes = future.result()
+                        except Exception as e:
+                            errors.append(f"{step.name}: {str(e)}")
+                            continue
+                        if boxes is None:
+                            skipped += 1
+                        elif boxes:
+                            found[number] = (step, number, boxes)
+                    progress.setValue(len(jobs) - len(pending))
+                    QApplication.processEvents()
+                    if progress.wasCanceled():
+                        for future in pending:
+                            future.cancel()
+                        return
+        finally:
+            progress.close()
+
+        notes = ""
+        if skipped:
+            notes += f"\n{skipped} etapa(s) ignorada(s): tamanho diferente ou tela inteira alterada."
+        if errors:
+            notes += "\n\nErros:\n" + "\n".join(errors[:10])
+        if not found:
+            QMessageBox.information(self, "Destacar Mudanças", "Nenhuma mudança encontrada." + notes)
+            return
+
+        # Propostas na ordem das etapas
+        dialog = ChangeReviewDialog([found[number] for number in sorted(found)], notes.strip(), self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        step_operations = dialog.step_operations()
+        if step_operations:
+            self.run_batch_operations([], False, step_operations)
+
     def delete_step(self):
-        current_item = self.step_list.currentItem()
-        if current_item:
+        row = self.current_row()
+        if row >= 0:
             reply = QMessageBox.question(self, "Confirmar", 
                                        "Tem certeza que deseja deletar esta etapa?",
                                        QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
-                row = self.step_list.row(current_item)
                 
-                # Deletar arquivo de imagem
-                try:
-                    os.remove(self.steps[row].image_path)
-                except:
-                    pass
+                # Deletar arquivo de imagem (apenas se pertencer somente a esta etapa)
+                if self.steps[row].owns_image:
+                    try:
+                        os.remove(self.steps[row].image_path)
+                    except:
+                        pass
                 
                 # Remover da lista
-                del self.steps[row]
-                self.step_list.takeItem(row)
+                self.journal_record("delete", row=row)
+                self.step_model.remove_step(row)
                 
                 # Limpar visualização se não há mais itens
                 if not self.steps:
@@ -976,35 +4719,66 @@ class DocCreator(QWidget):
                     self.desc_edit.clear()
 
     def update_description(self):
-        current_item = self.step_list.currentItem()
-        if current_item:
-            row = self.step_list.row(current_item)
-            if row < len(self.steps):
-                self.steps[row].description = self.desc_edit.toPlainText()
+        self.desc_preview.setText(rich_text_to_html(self.desc_edit.toPlainText()))
+        row = self.current_row()
+        if 0 <= row < len(self.steps):
+            step = self.steps[row]
+            description = self.desc_edit.toPlainText()
+            if description != step.description:
+                step.description = description
+                # Gravação adiada: cada tecla apenas reinicia o temporizador
+                self.pending_descriptions.add(step)
+                self.journal_timer.start(1000)
 
-    def display_step(self, item):
+    @traced("display_step")
+    def display_step(self, row):
         try:
-            row = self.step_list.row(item)
-            if row < len(self.steps):
+            if 0 <= row < len(self.steps):
                 step = self.steps[row]
                 
-                # Carregar e exibir imagem
-                if os.path.exists(step.image_path):
-                    pixmap = QPixmap(step.image_path)
-                    # Redimensionar mantendo proporção
-                    scaled_pixmap = pixmap.scaled(400, 300, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    self.image_label.setPixmap(scaled_pixmap)
-                else:
+                # Carregar e exibir imagem (já redimensionada, do cache quando possível)
+                key = self.previews.key_for(step.image_path)
+                self.waiting_preview = None
+                if key is None:
                     self.image_label.setText("Imagem não encontrada")
+                else:
+                    pixmap = self.previews.get(key)
+                    if pixmap is None and key in self.previews.pending:
+                        # Já está sendo preparada em segundo plano
+                        self.waiting_preview = key
+                        self.image_label.setText("Carregando...")
+                    else:
+                        if pixmap is None:
+                            pixmap = self.previews.load_now(key)
+                        if pixmap is None:
+                            self.image_label.setText("Imagem não encontrada")
+                        else:
+                            self.image_label.setPixmap(pixmap)
+
+                # Preparar as etapas vizinhas para a navegação seguinte
+                for neighbor in (row + 1, row - 1):
+                    if 0 <= neighbor < len(self.steps):
+                        self.previews.prefetch(self.steps[neighbor].image_path)
                 
                 # Carregar descrição
                 self.desc_edit.blockSignals(True)
                 self.desc_edit.setText(step.description)
                 self.desc_edit.blockSignals(False)
+                self.desc_preview.setText(rich_text_to_html(step.description))
                 
         except Exception as e:
             QMessageBox.warning(self, "Erro", f"Erro ao exibir etapa: {str(e)}")
 
+    def on_preview_ready(self, key):
+        if key == self.waiting_preview:
+            self.waiting_preview = None
+            self.image_label.setPixmap(self.previews.get(key))
+
+    def on_preview_failed(self, key):
+        if key == self.waiting_preview:
+            self.waiting_preview = None
+            self.image_label.setText("Imagem não encontrada")
+
     def generate_pdf(self):
         if not self.steps:
             QMessageBox.warning(self, "Aviso", "Nenhuma etapa para exportar.")
@@ -1014,108 +4788,61 @@ class DocCreator(QWidget):
         try:
             # Criar arquivo temporário para pré-visualização
             temp_pdf_path = os.path.join(os.path.dirname(__file__), 'temp_preview.pdf')
+            self.sync_fragments()
             
-            # Criar PDF
-            pdf = FPDF()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            
-            # Página de título
-            pdf.add_page()
-            pdf.set_font('Arial', 'B', 24)
-            pdf.cell(0, 20, self.doc_title, 0, 1, 'C')
-            pdf.ln(40)  # Espaço após o título
-
-            # Descrição na capa
-            if self.doc_description:
-                pdf.set_font('Arial', '', 12)
-                description_lines = self.doc_description.split('\n')
-                line_height = 8
-                total_height = len(description_lines) * line_height
-                y_position = (pdf.h - total_height) / 2
-                pdf.set_y(y_position)
-                
-                for line in description_lines:
-                    pdf.multi_cell(0, line_height, line, 0, 'C')
+            layouts = ["Uma etapa por página", "Compacto (várias etapas por página)"]
+            choice, ok = QInputDialog.getItem(self, "Layout do PDF", "Layout das etapas:", layouts,
+                                              layouts.index(self.pdf_layout_choice), False)
+            if not ok:
+                return
+            self.pdf_layout_choice = choice
+
+            writer = PDFDocumentWriter(self.doc_title, self.doc_description,
+                                       "compact" if choice == layouts[1] else "page")
+            for step in self.steps:
+                if not os.path.exists(step.image_path):
+                    writer.add_step(step.description)
+                    continue
+                try:
+                    # Dimensões originais a partir dos metadados (sem abrir o arquivo)
+                    meta = step.ensure_meta()
+                except Exception as e:
+                    writer.add_step(step.description, error=e)
+                    continue
+                writer.add_step(step.description, step.image_path,
+                                (meta.width, meta.height), meta.content_hash)
 
-            # Configurações de layout
-            page_margin = 15
-            content_width = pdf.w - (2 * page_margin)
-            
-            # Processar cada etapa
-            for i, step in enumerate(self.steps, 1):
-                pdf.add_page()
-                current_y = page_margin
-                
-                # Título da etapa
-                pdf.set_font('Arial', 'B', 14)
-                pdf.set_xy(page_margin, current_y)
-                pdf.cell(content_width, 10, f'Etapa {i}', 0, 1, 'L')
-                current_y += 15
-                
-                # Descrição
-                if step.description.strip():
-                    pdf.set_font('Arial', '', 11)
-                    pdf.set_xy(page_margin, current_y)
-                    pdf.multi_cell(content_width, 5, 
-                                 step.description.encode('latin-1', 'replace').decode('latin-1'))
-                    current_y = pdf.get_y() + 10
-                
-                # Imagem
-                if os.path.exists(step.image_path):
-                    try:
-                        # Obter dimensões originais da imagem
-                        img = Image.open(step.image_path)
-                        img_w, img_h = img.size
-                        
-                        # Calcular espaço disponível para a imagem
-                        available_height = pdf.h - current_y - (2 * page_margin)
-                        max_image_height = min(180, available_height)  # Limitar altura máxima
-                        
-                        # Calcular escala mantendo proporção
-                        scale = min(content_width/img_w, max_image_height/img_h)
-                        
-                        # Se a imagem for muito pequena, não ampliar além de 150%
-                        if scale > 1.5:
-                            scale = 1.5
-                        
-                        final_w = img_w * scale
-                        final_h = img_h * scale
-                        
-                        # Centralizar horizontalmente
-                        x_centered = page_margin + (content_width - final_w) / 2
-                        
-                        # Se a imagem não couber na página atual, criar nova página
-                        if current_y + final_h > pdf.h - page_margin:
-                            pdf.add_page()
-                            current_y = page_margin
-                        
-                        pdf.image(step.image_path, x=x_centered, y=current_y, 
-                                w=final_w, h=final_h)
-                        
-                    except Exception as e:
-                        pdf.set_font('Arial', 'I', 10)
-                        pdf.cell(0, 10, f'Erro ao carregar imagem: {str(e)}', 0, 1, 'L')
-        
             # Salvar PDF temporário para pré-visualização
-            pdf.output(temp_pdf_path)
+            with tracer.span("pdf.output", steps=len(self.steps)):
+                writer.output(temp_pdf_path)
             
             # Garantir que o arquivo foi fechado
-            del pdf
+            del writer
             
             # Mostrar pré-visualização
             preview_dialog = PDFPreviewDialog(temp_pdf_path, self)
             if preview_dialog.exec_() == QDialog.Accepted:
                 # Se o usuário confirmar, solicitar local para salvar
-                output_path, _ = QFileDialog.getSaveFileName(
-                    self, "Salvar PDF", "documentacao.pdf", "Arquivos PDF (*.pdf)"
+                filters = "Arquivos PDF (*.pdf)"
+                if web_pdf_available():
+                    filters += ";;PDF otimizado para web (*.pdf)"
+                output_path, selected_filter = QFileDialog.getSaveFileName(
+                    self, "Salvar PDF", "documentacao.pdf", filters
                 )
                 
                 if output_path:
                     # Copiar o arquivo temporário para o local escolhido
                     import shutil
                     shutil.copy2(temp_pdf_path, output_path)
-                    QMessageBox.information(self, "Sucesso", 
-                                          f"PDF gerado com sucesso!\nSalvo em: {output_path}")
+                    message = f"PDF gerado com sucesso!\nSalvo em: {output_path}"
+                    if selected_filter.startswith("PDF otimizado"):
+                        # O PDF já está salvo: uma falha aqui não o invalida
+                        try:
+                            before, after = optimize_pdf_for_web(output_path)
+                            message += f"\nOtimizado para web: {describe_size_change(before, after)}"
+                        except Exception as e:
+                            message += f"\nPDF salvo, otimização ignorada: {str(e)}"
+                    QMessageBox.information(self, "Sucesso", message)
             
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao gerar PDF: {str(e)}")
@@ -1128,125 +4855,564 @@ class DocCreator(QWidget):
                 except:
                     pass
 
+    def export_document(self):
+        if not self.steps:
+            QMessageBox.warning(self, "Aviso", "Nenhuma etapa para exportar.")
+            return
+
+        dialog = ExportDialog(self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.sync_fragments()
+            self.run_export(dialog.formats(), dialog.output_dir(), dialog.web_pdf(),
+                            dialog.pdf_layout())
+
+    def run_export(self, formats, output_dir, web_pdf=False, pdf_layout="page"):
+        """Exporta em todos os formatos de uma vez: cada imagem é decodificada uma única
+        vez nos processos de trabalho e o resultado alimenta todos os formatos"""
+        import zipfile
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        image_dir = os.path.join(output_dir, "img")
+        try:
+            os.makedirs(image_dir if "site" in formats else output_dir, exist_ok=True)
+            # Imagens iguais (mesmo conteúdo) são processadas uma única vez
+            image_names = []
+            for step in self.steps:
+                try:
+                    image_names.append(step.ensure_meta().content_hash[:16])
+                except (OSError, TypeError):
+                    image_names.append(None)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao exportar: {str(e)}")
+            return
+
+        unique = {}
+        for step, name in zip(self.steps, image_names):
+            if name is not None:
+                unique.setdefault(name, step.image_path)
+
+        # Saídas consumidas na ordem das etapas, à medida que as imagens ficam prontas
+        writer = None
+        if "pdf" in formats:
+            writer = PDFDocumentWriter(self.doc_title, self.doc_description, pdf_layout)
+        archive = None
+        if "zip" in formats:
+            # PNG já é comprimido: as imagens são apenas armazenadas
+            archive = zipfile.ZipFile(os.path.join(output_dir, "imagens.zip"), "w", zipfile.ZIP_STORED)
+        sections = []
+        next_row = 0
+
+        def consume_ready(results, errors):
+            nonlocal next_row
+            while next_row < len(self.steps):
+                step, name = self.steps[next_row], image_names[next_row]
+                if decode_formats and name is not None and name not in results and name not in errors:
+                    return
+                result = results.get(name) or {}
+                if writer is not None:
+                    if name is None:
+                        writer.add_step(step.description)
+                    elif name in errors:
+                        writer.add_step(step.description, error=errors[name])
+                    else:
+                        writer.add_step(step.description, result["pdf"], result["size"], name)
+                if archive is not None and name is not None:
+                    extension = os.path.splitext(step.image_path)[1] or ".png"
+                    archive.write(step.image_path, f"etapa_{next_row + 1:03d}{extension}")
+                sections.append((step.name, step.description, result.get("site")))
+                next_row += 1
+
+        # Decodificação só é necessária para PDF e site; o ZIP usa os arquivos originais
+        decode_formats = formats & {"pdf", "site"}
+        pool = get_worker_pool()
+        jobs = {}
+        if decode_formats:
+            jobs = {pool.submit(prepare_export_image, image_path, decode_formats, image_dir, name): name
+                    for name, image_path in unique.items()}
+
+        progress = QProgressDialog("Exportando...", "Cancelar", 0, len(self.steps), self)
+        progress.setWindowTitle("Exportar Documento")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        results, errors = {}, {}
+        pending = set(jobs)
+        try:
+            while True:
+                consume_ready(results, errors)
+                progress.setValue(next_row)
+                QApplication.processEvents()
+                if progress.wasCanceled():
+                    for future in pending:
+                        future.cancel()
+                    return
+                if not pending:
+                    break
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        results[jobs[future]] = future.result()
+                    except Exception as e:
+                        errors[jobs[future]] = e
+
+            if writer is not None:
+                pdf_path = os.path.join(output_dir, "documento.pdf")
+                writer.output(pdf_path)
+            if "site" in formats:
+                for file_name, content in (
+                    ("index.html", build_site_html(self.doc_title, self.doc_description, sections)),
+                    ("documento.md", build_site_markdown(self.doc_title, self.doc_description, sections))
+                ):
+                    with open(os.path.join(output_dir, file_name), "w", encoding='utf-8') as output_file:
+                        output_file.write(content)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao exportar: {str(e)}")
+            return
+        finally:
+            progress.close()
+            if archive is not None:
+                archive.close()
+
+        summary = f"Exportação concluída!\nSalvo em: {output_dir}"
+        # Por último, com todas as saídas já gravadas: uma falha só mantém o PDF como está
+        if web_pdf and writer is not None:
+            try:
+                size_change = describe_size_change(*optimize_pdf_for_web(pdf_path))
+                summary += f"\nPDF otimizado para web: {size_change}"
+            except Exception as e:
+                summary += f"\nPDF salvo, otimização ignorada: {str(e)}"
+        if errors:
+            summary += "\n\nErros:\n" + "\n".join(f"{name}: {str(e)}"
+                                                  for name, e in list(errors.items())[:10])
+        QMessageBox.information(self, "Sucesso", summary)
+
     def save_template(self):
         if not self.steps:
             QMessageBox.warning(self, "Aviso", "Nenhuma etapa para salvar como template.")
             return
         
         try:
-            output_path, _ = QFileDialog.getSaveFileName(
-                self, "Salvar Template", "template.json", "Arquivos JSON (*.json)"
+            output_path, selected_filter = QFileDialog.getSaveFileName(
+                self, "Salvar Template", "template.json",
+                f"Arquivos JSON (*.json);;Projeto em arquivo único (*{PROJECT_EXTENSION})"
             )
             
             if not output_path:
                 return
+
+            # Fragmentos atualizados desde o carregamento entram na versão nova
+            self.sync_fragments()
+
+            # Projeto em arquivo único (autocontido: as etapas de fragmentos são copiadas)
+            if selected_filter.startswith("Projeto") or output_path.endswith(PROJECT_EXTENSION):
+                if not output_path.endswith(PROJECT_EXTENSION):
+                    output_path = os.path.splitext(output_path)[0] + PROJECT_EXTENSION
+                self.save_project(output_path)
+                QMessageBox.information(self, "Sucesso",
+                          f"Projeto salvo com sucesso!\nSalvo em: {output_path}")
+                return
             
-            import json
-            import shutil
-            
-            template_name = os.path.splitext(os.path.basename(output_path))[0]
-            template_dir = os.path.join(os.path.dirname(output_path), template_name)
-            os.makedirs(template_dir, exist_ok=True)
-            
-            template_data = []
-            for i, step in enumerate(self.steps):
-                step_name = self.step_list.item(i).text()
-                
-                new_image_name = f"step_{i+1}.png"
-                new_image_path = os.path.join(template_dir, new_image_name)
-                shutil.copy2(step.image_path, new_image_path)
-                
-                template_data.append({
-                    "name": step_name,
-                    "image_path": os.path.join(template_name, new_image_name),
-                    "description": step.description
-                })
-        
-            with open(output_path, "w", encoding='utf-8') as json_file:
-                json.dump({
-                    "template_dir": template_name,
-                    "cover": {
-                        "title": self.doc_title,
-                        "description": self.doc_description
-                    },
-                    "steps": template_data
-                }, json_file, ensure_ascii=False, indent=4)
+            copied = self.save_json_template(output_path)
             
             QMessageBox.information(self, "Sucesso", 
-                      f"Template salvo com sucesso!\nSalvo em: {output_path}")
+                      f"Template salvo com sucesso!\nSalvo em: {output_path}\n"
+                      f"Imagens gravadas: {copied} de {len(self.steps)}")
         
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao salvar template: {str(e)}")
 
+    @traced("template.save")
+    def save_json_template(self, output_path):
+        import shutil
+
+        template_name = os.path.splitext(os.path.basename(output_path))[0]
+        template_dir = os.path.join(os.path.dirname(output_path), template_name)
+        os.makedirs(template_dir, exist_ok=True)
+
+        # Salvando de novo no mesmo template: só as imagens alteradas são copiadas
+        same_template = (self.template_path is not None and
+                         os.path.abspath(self.template_path) == os.path.abspath(output_path))
+        base_dir = os.path.dirname(output_path)
+
+        template_data = []
+        saved_images = []
+        copied = 0
+        i = 0
+        while i < len(self.steps):
+            count = self.fragment_run(i)
+            if count:
+                # Sequência intacta de um fragmento: grava só a referência, sem copiar imagens
+                template_data.append({"fragment": self.steps[i].fragment[0]})
+                saved_images += [None] * count
+                i += count
+                continue
+
+            step = self.steps[i]
+            # Etapa de fragmento alterada (ou fora da sequência) passa a ser uma etapa comum
+            step.fragment = None
+
+            image_name = step.saved_image
+            if (not same_template or "image" in step.dirty or not image_name or
+                    not os.path.exists(os.path.join(base_dir, image_name))):
+                # Nome estável: não depende da posição, então reordenar não exige cópias
+                image_name = os.path.join(template_name, f"step_{uuid.uuid4().hex[:12]}.png")
+                shutil.copy2(step.image_path, os.path.join(base_dir, image_name))
+                copied += 1
+            saved_images.append(image_name)
+
+            step_data = {
+                "name": step.name,
+                "image_path": image_name,
+                "description": step.description
+            }
+            try:
+                # copy2 preserva o mtime, então os metadados valem para a cópia
+                step_data["meta"] = step.ensure_meta().to_dict()
+            except (OSError, TypeError):
+                pass
+            template_data.append(step_data)
+            i += 1
+
+        atomic_write_json(output_path, {
+            "template_dir": template_name,
+            "cover": {
+                "title": self.doc_title,
+                "description": self.doc_description
+            },
+            "steps": template_data
+        })
+
+        # Remover imagens que o template deixou de referenciar
+        if same_template:
+            for image_name in self.template_files - set(saved_images):
+                try:
+                    os.remove(os.path.join(base_dir, image_name))
+                except OSError:
+                    pass
+
+        self.template_path = output_path
+        self.template_files = set(saved_images) - {None}
+        for step, image_name in zip(self.steps, saved_images):
+            step.mark_saved(image_name)
+        return copied
+
+    @traced("template.save_project")
+    def save_project(self, output_path):
+        entries = []
+        for step in self.steps:
+            if step.image_hash is not None and "image" not in step.dirty:
+                # Imagem inalterada desde o carregamento: nada é extraído nem relido
+                image_hash, meta = step.image_hash, step.meta
+            else:
+                # Metadados válidos fornecem o hash sem reler a imagem
+                meta = step.ensure_meta()
+                image_hash = meta.content_hash
+            entries.append({
+                "name": step.name,
+                "description": step.description,
+                "image_hash": image_hash,
+                "meta": meta.to_dict() if meta is not None else None,
+                # Só é usado se o projeto ainda não tiver essa imagem
+                "image_path": lambda step=step: step.image_path
+            })
+        hashes = save_project_file(output_path, self.doc_title, self.doc_description, entries)
+
+        self.template_path = output_path
+        self.template_files = set()
+        for step, image_hash in zip(self.steps, hashes):
+            step.image_hash = image_hash
+            step.mark_saved(None)
+
     def load_template(self):
         try:
             # Solicitar arquivo de template
             file_path, _ = QFileDialog.getOpenFileName(
-                self, "Carregar Template", "", "Arquivos JSON (*.json)"
+                self, "Carregar Template", "",
+                f"Templates e projetos (*.json *{PROJECT_EXTENSION});;"
+                f"Arquivos JSON (*.json);;Projeto em arquivo único (*{PROJECT_EXTENSION})"
             )
             
             if not file_path:
                 return
+
+            self.open_template_file(file_path)
+            QMessageBox.information(self, "Sucesso", "Template carregado com sucesso!")
             
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao carregar template: {str(e)}")
+
+    @traced("template.load")
+    def open_template_file(self, file_path):
+        if file_path.endswith(PROJECT_EXTENSION):
+            title, description, entries = load_project_file(file_path)
+            # Imagens são extraídas para o cache compartilhado só quando usadas
+            loaded_steps = []
+            for entry in entries:
+                step = Step(None, entry["description"], owns_image=False, name=entry["name"],
+                            image_loader=lambda image_hash=entry["image_hash"]:
+                                extract_project_blob(file_path, image_hash))
+                step.image_hash = entry["image_hash"]
+                step.meta = ImageMeta.from_dict(entry["meta"])
+                loaded_steps.append(step)
+            template_files = set()
+        else:
             # Carregar dados do template
             import json
             with open(file_path, "r", encoding='utf-8') as json_file:
                 template_data = json.load(json_file)
-            
+
             # Carregar dados da capa
+            title, description = self.doc_title, self.doc_description
             if "cover" in template_data:
-                self.doc_title = template_data["cover"].get("title", "Documentação de Processo")
-                self.doc_description = template_data["cover"].get("description", "")
-            
+                title = template_data["cover"].get("title", "Documentação de Processo")
+                description = template_data["cover"].get("description", "")
+
             template_dir = os.path.dirname(file_path)
-            
-            # Limpar etapas existentes
-            self.steps.clear()
-            self.step_list.clear()
-            
-            # Criar pasta images se não existir
-            images_dir = os.path.join(os.path.dirname(__file__), 'images')
-            os.makedirs(images_dir, exist_ok=True)
-            
-            # Adicionar etapas do template
-            for i, step_data in enumerate(template_data["steps"]):
-                # Caminho da imagem no template
-                template_image_path = os.path.join(template_dir, step_data["image_path"])
-                
-                if os.path.exists(template_image_path):
-                    # Copiar imagem para a pasta de desenvolvimento
-                    new_image_path = os.path.join(images_dir, f"step_{i+1}.png")
-                    import shutil
-                    shutil.copy2(template_image_path, new_image_path)
-                    
-                    step = Step(new_image_path, step_data["description"])
-                    self.steps.append(step)
-                    
-                    item = QListWidgetItem(step_data["name"])
-                    self.step_list.addItem(item)
-        
-            # Selecionar primeira etapa se existir
-            if self.step_list.count() > 0:
-                self.step_list.setCurrentRow(0)
-                self.display_step(self.step_list.item(0))
-        
-            QMessageBox.information(self, "Sucesso", "Template carregado com sucesso!")
-            
+
+            # As imagens são lidas diretamente da pasta do template; uma cópia só
+            # é feita em 'images' quando a etapa for editada
+            loaded_steps = []
+            for step_data in expand_template_steps(template_data["steps"]):
+                step = Step(os.path.join(template_dir, step_data["image_path"]),
+                            step_data["description"], owns_image=False, name=step_data["name"])
+                step.fragment = step_data["fragment"]
+                # Imagens de fragmentos ficam na pasta de fragmentos, fora do template
+                step.saved_image = None if step.fragment else step_data["image_path"]
+                step.meta = ImageMeta.from_dict(step_data.get("meta"))
+                loaded_steps.append(step)
+            template_files = {step.saved_image for step in loaded_steps if step.saved_image}
+
+        # Próximos salvamentos neste arquivo gravam apenas o que mudar
+        for step in loaded_steps:
+            step.mark_saved(step.saved_image)
+        self.template_path = file_path
+        self.template_files = template_files
+
+        self.set_document(title, description, loaded_steps)
+
+    def set_document(self, title, description, steps):
+        self.doc_title = title
+        self.doc_description = description
+
+        # Substituir a lista inteira de uma vez (um único reset do modelo)
+        self.step_model.reset_steps(steps)
+        # O diário passa a partir deste documento
+        self.compact_journal()
+
+        # Selecionar primeira etapa se existir
+        if self.steps:
+            self.select_row(0)
+        else:
+            self.image_label.clear()
+            self.image_label.setText("Nenhuma imagem selecionada")
+            self.desc_edit.clear()
+
+    def fragment_intact(self, step):
+        """True enquanto a etapa tem o mesmo conteúdo do fragmento de origem"""
+        return step.fragment is not None and step.dirty.isdisjoint(Step.TRACKED)
+
+    def fragment_run(self, start):
+        """Tamanho da sequência intacta de fragmento que começa em start (0 se não houver)"""
+        fragment = self.steps[start].fragment
+        if fragment is None or fragment[1] != 0:
+            return 0
+        name, _, count, version = fragment
+        run = self.steps[start:start + count]
+        if len(run) == count and all(step.fragment == (name, index, count, version) and
+                                     self.fragment_intact(step)
+                                     for index, step in enumerate(run)):
+            return count
+        return 0
+
+    def fragment_steps(self, name):
+        """Etapas novas a partir da versão atual do fragmento"""
+        version, fragment_steps = resolve_fragment(name)
+        steps = []
+        for index, step_data in enumerate(fragment_steps):
+            step = Step(step_data["image_path"], step_data["description"], owns_image=False,
+                        name=step_data["name"])
+            step.meta = ImageMeta.from_dict(step_data["meta"])
+            step.fragment = (name, index, len(fragment_steps), version)
+            # Iguais ao fragmento: só edições feitas depois desfazem o vínculo
+            step.dirty.difference_update(Step.TRACKED)
+            steps.append(step)
+        return steps
+
+    def sync_fragments(self):
+        """Troca as sequências de fragmentos atualizados desde o carregamento pela
+        versão atual; etapas de fragmento editadas neste documento são mantidas"""
+        steps, changed, i = [], False, 0
+        while i < len(self.steps):
+            count = self.fragment_run(i)
+            if not count:
+                steps.append(self.steps[i])
+                i += 1
+                continue
+            name, _, _, version = self.steps[i].fragment
+            try:
+                if resolve_fragment(name)[0] != version:
+                    steps += self.fragment_steps(name)
+                    changed = True
+                else:
+                    steps += self.steps[i:i + count]
+            except (OSError, ValueError):
+                # Fragmento removido ou inválido: as etapas já carregadas continuam valendo
+                steps += self.steps[i:i + count]
+            i += count
+        if changed:
+            row = self.current_row()
+            self.step_model.reset_steps(steps)
+            self.compact_journal()
+            if self.steps:
+                self.select_row(min(max(row, 0), len(self.steps) - 1))
+        return changed
+
+    def insert_fragment(self):
+        fragments = list_fragments()
+        if not fragments:
+            QMessageBox.information(self, "Fragmentos",
+                                    "Nenhum fragmento salvo. Use \"Salvar etapas como fragmento\".")
+            return
+        labels = [f"{title} · {count} etapa(s)" for name, title, count in fragments]
+        label, ok = QInputDialog.getItem(self, "Inserir Fragmento", "Fragmento:", labels, 0, False)
+        if not ok:
+            return
+        try:
+            steps = self.fragment_steps(fragments[labels.index(label)][0])
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao carregar fragmento: {str(e)}")
+            return
+
+        # Logo após a etapa selecionada (ou no final)
+        row = self.current_row() + 1 if self.current_row() >= 0 else len(self.steps)
+        for offset, step in enumerate(steps):
+            self.step_model.insert_step(row + offset, step)
+            self.journal_record("add", row=row + offset, step=self.journal_entry(step))
+        if steps:
+            self.select_row(row)
+
+    def save_steps_as_fragment(self):
+        if not self.steps:
+            QMessageBox.warning(self, "Aviso", "Nenhuma etapa para salvar como fragmento.")
+            return
+        dialog = StepPickerDialog([(i, f"{i + 1}. {step.name}") for i, step in enumerate(self.steps)],
+                                  "Etapas do Fragmento", self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        indices = dialog.selected_indices()
+        if not indices:
+            QMessageBox.warning(self, "Aviso", "Nenhuma etapa selecionada.")
+            return
+        title, ok = QInputDialog.getText(self, "Salvar Fragmento", "Nome do fragmento:")
+        if not ok or not title.strip():
+            return
+        title = title.strip()
+        name = fragment_name(title)
+        if os.path.exists(fragment_path(name)):
+            reply = QMessageBox.question(
+                self, "Confirmar",
+                f"O fragmento \"{title}\" já existe. Atualizá-lo?\n"
+                "Todos os documentos que o usam passarão a mostrar a nova versão.",
+                QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+
+        try:
+            selected = [self.steps[i] for i in indices]
+            save_fragment(name, title, [{"name": step.name, "description": step.description,
+                                         "image_path": step.image_path,
+                                         "meta": step.ensure_meta().to_dict()}
+                                        for step in selected])
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao salvar fragmento: {str(e)}")
+            return
+
+        # Etapas consecutivas passam a referenciar o fragmento neste documento
+        if indices == list(range(indices[0], indices[-1] + 1)):
+            steps = self.steps[:indices[0]] + self.fragment_steps(name) + self.steps[indices[-1] + 1:]
+            self.step_model.reset_steps(steps)
+            self.compact_journal()
+            self.select_row(indices[0])
+        # Outras ocorrências deste fragmento no documento recebem a nova versão
+        self.sync_fragments()
+        QMessageBox.information(self, "Sucesso",
+                                f"Fragmento \"{title}\" salvo com {len(indices)} etapa(s).\n"
+                                f"Salvo em: {fragment_path(name)}")
+
+    def show_metrics(self):
+        MetricsDialog(tracer, self).exec_()
+
+    def toggle_watch_folder(self, checked):
+        self.watch_status.clear()
+        if not checked:
+            self.folder_watcher.stop()
+            self.watch_btn.setText("👁️ Monitorar")
+            return
+
+        directory = QFileDialog.getExistingDirectory(self, "Pasta a Monitorar")
+        if not directory:
+            self.watch_btn.setChecked(False)
+            return
+        try:
+            self.folder_watcher.start(directory)
+        except OSError as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao monitorar pasta: {str(e)}")
+            self.watch_btn.setChecked(False)
+            return
+        self.watch_btn.setText(f"👁️ {os.path.basename(directory) or directory}")
+
+    def ingest_images(self, paths):
+        self.ingest_pool.start(IngestImagesTask(paths, self.ingest_signals))
+
+    def on_ingest_failed(self, source):
+        self.watch_status.setText(f"⚠️ Não foi possível importar {os.path.basename(source)}")
+
+    def on_image_ingested(self, source, image_path, meta):
+        step = Step(image_path, "", name=os.path.splitext(os.path.basename(source))[0])
+        step.meta = meta
+        row = self.step_model.append_step(step)
+        self.journal_record("add", row=row, step=self.journal_entry(step))
+        if self.current_row() < 0:
+            self.select_row(row)
+
+    def open_library(self):
+        dialog = TemplateLibraryDialog(self.thumbnails, parent=self)
+        if dialog.exec_() != QDialog.Accepted or dialog.selected is None:
+            return
+        try:
+            self.open_template_file(dialog.selected)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao carregar template: {str(e)}")
+
+    def search_templates(self):
+        dialog = TemplateSearchDialog(self.search_index, self)
+        if dialog.exec_() != QDialog.Accepted or dialog.selected is None:
+            return
+
+        path, row = dialog.selected
+        try:
+            self.open_template_file(path)
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao carregar template: {str(e)}")
+            return
+        # Ir direto para a etapa encontrada (a capa abre na primeira etapa)
+        if 0 <= row < len(self.steps):
+            self.select_row(row)
 
     def edit_step_name(self):
-        current_item = self.step_list.currentItem()
-        if current_item:
+        row = self.current_row()
+        if 0 <= row < len(self.steps):
             text, ok = QInputDialog.getText(
                 self, 
                 "Editar Nome", 
                 "Digite o novo nome da etapa:",
                 QLineEdit.Normal,
-                current_item.text()
+                self.steps[row].name
             )
             if ok and text:
-                current_item.setText(text)
+                self.steps[row].name = text
+                self.step_model.step_changed(row)
+                self.journal_record("rename", row=row, name=text)
 
     # Adicione este método após init_ui na classe DocCreator
     def edit_cover(self):
@@ -1254,6 +5420,97 @@ class DocCreator(QWidget):
         if dialog.exec_() == QDialog.Accepted:
             self.doc_title = dialog.title_edit.text()
             self.doc_description = dialog.desc_edit.toPlainText()
+            self.journal_record("cover", title=self.doc_title, description=self.doc_description)
+
+    def journal_entry(self, step):
+        entry = {"name": step.name, "description": step.description,
+                 "owns_image": step.owns_image, "image_path": None, "project": None,
+                 "fragment": step.fragment if step.fragment and self.fragment_intact(step) else None}
+        if step.is_loaded:
+            entry["image_path"] = step.image_path
+        else:
+            # Imagem ainda dentro do projeto: registra a referência sem extraí-la
+            entry["project"] = self.template_path
+            entry["image_hash"] = step.image_hash
+        return entry
+
+    def journal_record(self, op, **data):
+        try:
+            # Descrições pendentes primeiro, para manter a ordem das alterações
+            self.flush_journal()
+            self.journal.append(op, **data)
+            if self.journal.records > AutosaveJournal.MAX_RECORDS:
+                self.compact_journal()
+        except OSError:
+            # Falhas no diário não devem interromper a edição
+            pass
+
+    def flush_journal(self):
+        self.journal_timer.stop()
+        pending, self.pending_descriptions = self.pending_descriptions, set()
+        try:
+            for step in pending:
+                if step in self.steps:
+                    self.journal.append("description", row=self.steps.index(step),
+                                        description=step.description)
+        except OSError:
+            pass
+
+    def journal_move(self, parent, start, end, destination, row):
+        # 'row' é a posição antes da remoção da origem; o diário guarda a posição final
+        to = row if row < start else row - (end - start + 1)
+        self.journal_record("move", row=start, to=to)
+
+    def compact_journal(self):
+        self.journal_timer.stop()
+        self.pending_descriptions.clear()
+        try:
+            self.journal.compact({
+                "title": self.doc_title,
+                "description": self.doc_description,
+                "steps": [self.journal_entry(step) for step in self.steps]
+            })
+        except OSError:
+            pass
+
+    def compact_journal_if_needed(self):
+        if self.journal.records > 100:
+            self.compact_journal()
+
+    def offer_recovery(self):
+        reply = QMessageBox.question(self, "Recuperar Trabalho",
+                                     "O programa não foi encerrado corretamente.\n"
+                                     "Deseja recuperar as alterações não salvas?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            self.journal.discard()
+            return
+
+        try:
+            title, description, entries = self.journal.replay()
+            recovered_steps = []
+            for entry in entries:
+                if entry.get("project"):
+                    step = Step(None, entry["description"], owns_image=False, name=entry["name"],
+                                image_loader=lambda project=entry["project"], image_hash=entry["image_hash"]:
+                                    extract_project_blob(project, image_hash))
+                    step.image_hash = entry["image_hash"]
+                else:
+                    step = Step(entry["image_path"], entry["description"],
+                                owns_image=entry["owns_image"], name=entry["name"])
+                if entry.get("fragment"):
+                    name, index, count, version = entry["fragment"]
+                    step.fragment = (name, index, count, tuple(version))
+                    step.dirty.difference_update(Step.TRACKED)
+                recovered_steps.append(step)
+            self.set_document(title, description, recovered_steps)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao recuperar alterações: {str(e)}")
+
+    def closeEvent(self, event):
+        # Encerramento normal: o diário só serve para recuperar falhas
+        self.journal.discard()
+        super().closeEvent(event)
 
 class PDFPreviewDialog(QDialog):
     def __init__(self, pdf_path, parent=None):
@@ -1290,7 +5547,8 @@ class PDFPreviewDialog(QDialog):
         layout.setSpacing(15)
         layout.setContentsMargins(20, 20, 20, 20)
         
-        # Visualizador de PDF
+        # Visualizador de PDF (QtWebEngine só é carregado aqui)
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
         self.web_view = QWebEngineView()
         # Converter caminho para URL e garantir que seja absoluto
         pdf_url = QUrl.fromLocalFile(os.path.abspath(pdf_path))
@@ -1332,8 +5590,60 @@ class PDFPreviewDialog(QDialog):
             self.web_view.settings().PdfViewerEnabled, True
         )
 
+def profile_imports(limit=25):
+    """Mede a abertura do programa com 'python -X importtime' e lista as importações mais lentas"""
+    import subprocess
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--startup-only"],
+        stderr=subprocess.PIPE, universal_newlines=True
+    )
+    elapsed = time.perf_counter() - started
+
+    # Linhas no formato "import time: próprio | acumulado | módulo"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        # Apenas importações de primeiro nível (sem recuo); o acumulado inclui as internas
+        if name.startswith("  "):
+            continue
+        timings.append((int(fields[1]), int(fields[0]), name.strip()))
+
+    timings.sort(reverse=True)
+    total = sum(cumulative for cumulative, _, _ in timings)
+    print(f"Abertura completa (janela criada): {elapsed * 1000:.0f} ms")
+    print(f"Importações de primeiro nível: {total / 1000:.0f} ms\n")
+    print(f"{'acumulado (ms)':>15} {'próprio (ms)':>13}  módulo")
+    for cumulative, own, name in timings[:limit]:
+        print(f"{cumulative / 1000:15.1f} {own / 1000:13.1f}  {name}")
+    return result.returncode
+
 if __name__ == "__main__":
+    # Perfil das importações na abertura: python doc_creator.py --profile-imports
+    if "--profile-imports" in sys.argv:
+        sys.exit(profile_imports())
+
+    # Necessário para o pool de processos em executáveis gerados pelo PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    # Permite importar o QtWebEngine depois de criar a aplicação (pré-visualização do PDF)
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(shutdown_worker_pool)
+
+    # Medição de desempenho desde a abertura: DOC_CREATOR_TRACE=1
+    # (DOC_CREATOR_TRACE_MEMORY=1 mede também a memória)
+    if os.environ.get("DOC_CREATOR_TRACE"):
+        tracer.enable()
+        if os.environ.get("DOC_CREATOR_TRACE_MEMORY"):
+            tracer.track_memories()
+    app.aboutToQuit.connect(lambda: tracer.enable(False))
     
     # Configurar aplicação
     app.setApplicationName("Gerador de Documentação")
@@ -1343,5 +5653,9 @@ if __name__ == "__main__":
     creator = DocCreator()
     creator.resize(800, 700)
     creator.show()
+
+    # Usado por --profile-imports: encerra assim que a janela é exibida
+    if "--startup-only" in sys.argv:
+        QTimer.singleShot(0, app.quit)
     
     sys.exit(app.exec_())
\ No newline at end of file
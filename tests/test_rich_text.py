@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doc_creator import parse_inline
+
+
+@pytest.mark.parametrize("text", [
+    "config_file_path.txt",
+    "snake_case_name",
+    r"C:\my_folder\my_file.png",
+    "my__double__name",
+])
+def test_underscores_inside_words_are_plain_text(text):
+    assert parse_inline(text) == [(text, "")]
+
+
+def test_underscore_emphasis_between_words():
+    assert parse_inline("um _itálico_ e um __negrito__.") == [
+        ("um ", ""), ("itálico", "I"), (" e um ", ""), ("negrito", "B"), (".", ""),
+    ]
+
+
+def test_underscore_emphasis_next_to_punctuation():
+    assert parse_inline("(_nota_): veja config_file.txt") == [
+        ("(", ""), ("nota", "I"), ("): veja config_file.txt", ""),
+    ]
+
+
+def test_asterisks_and_code():
+    assert parse_inline("**a** *b* `c_d_e`") == [
+        ("a", "B"), (" ", ""), ("b", "I"), (" ", ""), ("c_d_e", "C"),
+    ]